@@ -16,8 +16,14 @@ from django.core.exceptions import (
 )
 from django.db import DatabaseError, IntegrityError, DataError
 from ninja.errors import ValidationError as NinjaValidationError
+from utils.renderers import FastJSONParser, FastJSONRenderer
 
-api = NinjaAPI(urls_namespace="rems_api_v1", version="1.0.0")
+api = NinjaAPI(
+    urls_namespace="rems_api_v1",
+    version="1.0.0",
+    renderer=FastJSONRenderer(),
+    parser=FastJSONParser(),
+)
 
 """
 NOTE: Registration of endpoints here 👇
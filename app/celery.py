@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from django.conf import settings
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
 
@@ -10,6 +11,27 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 
+@app.on_after_configure.connect
+def setup_periodic_tasks(sender, **kwargs):
+    sender.add_periodic_task(
+        settings.ANALYTICS_ROLLUP_INTERVAL,
+        sender.signature("products.analytics.refresh_analytics_rollups"),
+        name="refresh-analytics-rollups",
+    )
+
+    sender.add_periodic_task(
+        settings.IMAGE_BLOB_GC_INTERVAL,
+        sender.signature("products.blobs.collect_image_blobs"),
+        name="collect-image-blobs",
+    )
+
+    sender.add_periodic_task(
+        settings.FEED_EXPORT_INTERVAL,
+        sender.signature("products.feeds.export_product_feed"),
+        name="export-product-feed",
+    )
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f"Request: {self.request!r}")
@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # third party libraries
     "corsheaders",
     "django_countries",
@@ -159,28 +160,97 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME")
 AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL")
 
+# "path" for S3 stand-ins such as MinIO
+AWS_S3_ADDRESSING_STYLE = os.getenv("AWS_S3_ADDRESSING_STYLE")
+
 AWS_DEFAULT_ACL = None
 
+# Set AWS_PUBLIC_MEDIA when the bucket is publicly readable: media URLs are
+# then MEDIA_URL plus the key instead of presigned (utils.storage)
+AWS_QUERYSTRING_AUTH = not bool(os.getenv("AWS_PUBLIC_MEDIA", default=False))
+
+# Lifetime of presigned direct-upload POSTs (utils.uploads)
+UPLOAD_URL_EXPIRY = int(os.getenv("UPLOAD_URL_EXPIRY", default=15 * 60))
+
+# Content-addressed keys get a year-long, immutable CacheControl instead,
+# see utils.storage.MediaStorage
 AWS_S3_OBJECT_PARAMETERS = {
     "CacheControl": "max-age=86400",
 }
 
+# How long an unreferenced image blob is kept, and how often they are
+# collected (products.blobs)
+IMAGE_BLOB_GRACE = int(os.getenv("IMAGE_BLOB_GRACE", default=24 * 60 * 60))
+IMAGE_BLOB_GC_INTERVAL = int(os.getenv("IMAGE_BLOB_GC_INTERVAL", default=60 * 60))
+
 MEDIA_URL = f"{AWS_S3_ENDPOINT_URL}/{AWS_STORAGE_BUCKET_NAME}/"
 
 STORAGES = {
     "default": {
-        "BACKEND": "storages.backends.s3.S3Storage",
+        "BACKEND": "utils.storage.MediaStorage",
     },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+if os.getenv("CACHE_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Public catalog response cache (utils.cache)
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", default=300))
+RESPONSE_CACHE_LOCK_TIMEOUT = 5
+RESPONSE_CACHE_EARLY_RECOMPUTE_BETA = 1.0
+# Count hits and misses for response_cache_stats, two extra cache writes
+# per request
+RESPONSE_CACHE_STATS = bool(os.getenv("RESPONSE_CACHE_STATS", default=False))
+
+# Analytics rollups (products.analytics), refreshed by celery beat
+ANALYTICS_ROLLUP_INTERVAL = int(os.getenv("ANALYTICS_ROLLUP_INTERVAL", default=300))
+# Older rollups are bypassed for live queries
+ANALYTICS_MAX_STALENESS = int(os.getenv("ANALYTICS_MAX_STALENESS", default=900))
+ANALYTICS_ROLLUP_DAYS = 30
+
+# Shopping partner feed (products.feeds), exported by celery beat
+FEED_EXPORT_INTERVAL = int(os.getenv("FEED_EXPORT_INTERVAL", default=24 * 60 * 60))
+# A run still holding the lock after this long is presumed dead
+FEED_EXPORT_LOCK_TIMEOUT = int(os.getenv("FEED_EXPORT_LOCK_TIMEOUT", default=60 * 60))
+FEED_CURRENCY = "USD"
+
+# Keyset pagination for list endpoints
+KEYSET_PAGE_SIZE = int(os.getenv("KEYSET_PAGE_SIZE", default=24))
+KEYSET_MAX_PAGE_SIZE = int(os.getenv("KEYSET_MAX_PAGE_SIZE", default=100))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Answer role and active checks from signed login claims instead of the
+# database. Revocation relies on the per-user token_version kept in the cache.
+AUTH_STATELESS_JWT = bool(os.getenv("AUTH_STATELESS_JWT", default=False))
+
+# How long a worker trusts its cached token_version and is_active. Without a
+# shared cache (CACHE_URL) this is how long a revoked token stays usable.
+AUTH_TOKEN_STATE_TTL = int(os.getenv("AUTH_TOKEN_STATE_TTL", default=60))
+
+# Number of verified login tokens each worker process keeps decoded in memory
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", default=10000))
+
 # Organization's proper name
 ORGANIZATION_NAME = os.getenv("ORGANIZATION_NAME")
 
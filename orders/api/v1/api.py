@@ -1,19 +1,27 @@
 import stripe
+from typing import Literal
+from datetime import date, datetime, time, timedelta
 from ninja import Router
 from django.conf import settings
+from django.utils import timezone
 from products.models import Product
 from .schema import OrderStatusSchema
-from users.models import ArtistProfile
 from orders.models import Order, OrderItem
 from utils.notifications import send_email
 from utils.stripe import create_payment_link
+from utils.pagination import paginate_keyset
+from products.rows import sparse_rows
+from products.api.v1.schema import ProductSchema
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from utils.base import (
     parse_uuid,
+    parse_field_list,
     AuthBearer,
     require_role,
     require_active,
+    get_principal,
+    get_artist_profile,
     get_authenticated_user,
 )
 from .schema import OrderInputSchema
@@ -26,78 +34,205 @@ stripe.api_key = settings.STRIPE_SECRET_KEY
 endpoint_secret = settings.STRIPE_WEBHOOK_SIGNING_KEY
 
 
-@router.get("/user-orders", auth=bearer, response=dict)
-@require_active
-@require_role(is_artist=False)
-def get_all_user_orders(request):
-    user = get_authenticated_user(request)
+# ?fields= picks from these; ?expand=product embeds each item's product as
+# ProductSchema (and implies items)
+ORDER_FIELDS = (
+    "id",
+    "payment_status",
+    "shipping_status",
+    "total_price",
+    "created_at",
+    "items",
+)
 
-    orders = Order.objects.filter(user=user).order_by("-created_at")
-
-    results = [
-        {
-            "id": str(order.id),
-            "payment_status": order.payment_status,
-            "shipping_status": order.shipping_status,
-            "total_price": float(order.total_price),
-            "created_at": order.created_at.isoformat(),
-            "items": [
-                {
-                    "product_id": str(item.product.id),
-                    "quantity": item.quantity,
-                    "price": float(item.price),
-                    "name": item.product.name,
-                }
-                for item in order.items.all()  # type: ignore
-            ],
+ORDER_EXPANSIONS = ("product",)
+
+# Order histories are paged on this keyset; see utils.pagination
+ORDER_ORDERING = ("-created_at", "-id")
+
+OrderStatus = Literal["pending", "processing", "shipped", "delivered", "canceled"]
+PaymentStatus = Literal["paid", "not_paid"]
+
+
+def filter_orders(
+    orders,
+    status: str | None,
+    payment_status: str | None,
+    date_from: date | None,
+    date_to: date | None,
+):
+    """Orders narrowed by shipping / payment status and an inclusive date range
+
+    Dates become bounds on created_at itself (in the current time zone), so
+    the (user, created_at) index still applies.
+    """
+
+    if status:
+        orders = orders.filter(shipping_status=status)
+
+    if payment_status:
+        orders = orders.filter(payment_status=payment_status)
+
+    if date_from:
+        orders = orders.filter(created_at__gte=_start_of(date_from))
+
+    if date_to:
+        orders = orders.filter(created_at__lt=_start_of(date_to + timedelta(days=1)))
+
+    return orders
+
+
+def _start_of(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.get_current_timezone())
+
+
+def serialize_orders(
+    orders, fields, expand, cursor=None, page_size=None, **item_filters
+) -> tuple[list[dict], str | None]:
+    """One page of orders and their items, in three queries at most
+
+    orders must be ordered by ORDER_ORDERING. Only the requested columns
+    are selected; items are skipped entirely unless requested, and
+    item_filters narrows them (e.g. to one seller).
+    """
+
+    names = set(parse_field_list(fields, ORDER_FIELDS, "fields") or ORDER_FIELDS)
+    expanded = parse_field_list(expand, ORDER_EXPANSIONS, "expand") or set()
+
+    if expanded:
+        names.add("items")
+
+    # the keyset columns are always selected
+    columns = {"id", "created_at"} | (names - {"items"})
+
+    rows, next_cursor = paginate_keyset(orders.values(*columns), cursor, page_size)
+
+    items = {}
+
+    if "items" in names:
+        for item in OrderItem.objects.filter(
+            order_id__in=[row["id"] for row in rows], **item_filters
+        ).values("order_id", "product_id", "quantity", "price", "product__name"):
+            items.setdefault(item["order_id"], []).append(item)
+
+    products = {}
+
+    if "product" in expanded:
+        serializer = sparse_rows(ProductSchema, None, None)
+
+        products = {
+            row["id"]: serializer.serialize(row)
+            for row in serializer.rows(
+                Product.objects.filter(
+                    id__in={
+                        item["product_id"]
+                        for order_items in items.values()
+                        for item in order_items
+                    }
+                )
+            )
         }
-        for order in orders
-    ]
 
-    return {"orders": results}
+    formatters = {
+        "id": str,
+        "payment_status": None,
+        "shipping_status": None,
+        "total_price": float,
+        "created_at": lambda value: value.isoformat(),
+    }
+
+    results = []
 
+    for row in rows:
+        result = {
+            name: format(row[name]) if format else row[name]
+            for name, format in formatters.items()
+            if name in names
+        }
 
-@router.get("/seller-orders", auth=bearer, response=dict)
+        if "items" in names:
+            result["items"] = []
+
+            for item in items.get(row["id"], []):
+                entry = {
+                    "product_id": str(item["product_id"]),
+                    "quantity": item["quantity"],
+                    "price": float(item["price"]),
+                    "name": item["product__name"],
+                }
+
+                if "product" in expanded:
+                    entry["product"] = products.get(item["product_id"])
+
+                result["items"].append(entry)
+
+        results.append(result)
+
+    return results, next_cursor
+
+
+@router.get("/user-orders", auth=bearer, response=dict)
 @require_active
-@require_role(is_artist=True)
-def get_all_seller_orders(request):
-    user = get_authenticated_user(request)
+@require_role(is_artist=False)
+def get_all_user_orders(
+    request,
+    cursor: str = None,  # type: ignore
+    page_size: int = None,  # type: ignore
+    status: OrderStatus = None,  # type: ignore
+    payment_status: PaymentStatus = None,  # type: ignore
+    date_from: date = None,  # type: ignore
+    date_to: date = None,  # type: ignore
+    fields: str = None,  # type: ignore
+    expand: str = None,  # type: ignore
+):
+    principal = get_principal(request)
+
+    orders = filter_orders(
+        Order.objects.filter(user_id=principal.id),
+        status,
+        payment_status,
+        date_from,
+        date_to,
+    ).order_by(*ORDER_ORDERING)
+
+    results, next_cursor = serialize_orders(orders, fields, expand, cursor, page_size)
+
+    return {"orders": results, "next_cursor": next_cursor}
 
-    artist_profile = ArtistProfile.objects.get(user=user)
 
-    orders = (
+@router.get("/seller-orders", auth=bearer, response=dict)
+@require_active
+@require_role(is_artist=True)
+def get_all_seller_orders(
+    request,
+    cursor: str = None,  # type: ignore
+    page_size: int = None,  # type: ignore
+    status: OrderStatus = None,  # type: ignore
+    payment_status: PaymentStatus = None,  # type: ignore
+    date_from: date = None,  # type: ignore
+    date_to: date = None,  # type: ignore
+    fields: str = None,  # type: ignore
+    expand: str = None,  # type: ignore
+):
+    artist_profile = get_artist_profile(request)
+
+    orders = filter_orders(
         Order.objects.filter(
-            items__product__artist=artist_profile,
-        )
-        .distinct()
-        .order_by("-created_at")
+            id__in=OrderItem.objects.filter(
+                product__artist=artist_profile
+            ).values("order_id"),
+        ),
+        status,
+        payment_status,
+        date_from,
+        date_to,
+    ).order_by(*ORDER_ORDERING)
+
+    results, next_cursor = serialize_orders(
+        orders, fields, expand, cursor, page_size, product__artist=artist_profile
     )
 
-    results = []
-    for order in orders:
-        seller_items = [
-            {
-                "product_id": str(item.product.id),
-                "quantity": item.quantity,
-                "price": float(item.price),
-                "name": item.product.name,
-            }
-            for item in order.items.all()  # type: ignore
-            if item.product.artist == artist_profile
-        ]
-        
-        results.append(
-            {
-                "id": str(order.id),
-                "payment_status": order.payment_status,
-                "shipping_status": order.shipping_status,
-                "total_price": float(order.total_price),
-                "created_at": order.created_at.isoformat(),
-                "items": seller_items,
-            }
-        )
-
-    return {"orders": results}
+    return {"orders": results, "next_cursor": next_cursor}
 
 
 @router.put("/user-orders/{order_id}", auth=bearer, response=dict)
@@ -59,6 +59,13 @@ class Order(models.Model):
     class Meta:
         verbose_name = "Buyer Order"
         verbose_name_plural = "Buyer Orders"
+        indexes = [
+            # a buyer's order history, keyset paginated on (created_at, id)
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="order_user_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Order for {self.user.username}"
@@ -1,3 +1,75 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from users.models import User, ArtistProfile
+from utils.base import login_jwt
+from products.models import Category, Product
+from orders.models import Order, OrderItem
 
-# Create your tests here.
+
+class OrderHistoryQueryTests(TestCase):
+    """Order histories run a fixed number of queries, whatever the page size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.artist = User.objects.create(username="artist", is_artist=True)
+        cls.buyer = User.objects.create(username="buyer")
+        store = ArtistProfile.objects.create(
+            user=cls.artist, store_name="Glass Co", about="Hand blown glass"
+        )
+        category = Category.objects.create(name="Vases")
+
+        products = [
+            Product.objects.create(
+                artist=store,
+                category=category,
+                name=f"Vase {i}",
+                description="Hand blown glass",
+                price="12.50",
+            )
+            for i in range(3)
+        ]
+
+        for _ in range(30):
+            order = Order.objects.create(user=cls.buyer, total_price="25.00")
+
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, price=product.price)
+                for product in products[:2]
+            )
+
+    def get(self, url: str, user: User, page_size: int, **params):
+        return self.client.get(
+            url,
+            query_params={"page_size": page_size, **params},
+            headers={"Authorization": f"Bearer {login_jwt(user)}"},
+        )
+
+    def assertConstantQueries(self, url: str, user: User, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(url, user, 5, **params)
+
+        self.assertEqual(len(response.json()["orders"]), 5)
+
+        with self.assertNumQueries(len(queries)):
+            response = self.get(url, user, 25, **params)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["orders"]), 25)
+        self.assertEqual(len(response.json()["orders"][0]["items"]), 2)
+
+    def test_user_orders(self):
+        self.assertConstantQueries("/api/v1/orders/user-orders", self.buyer)
+
+    def test_user_orders_with_products(self):
+        self.assertConstantQueries(
+            "/api/v1/orders/user-orders", self.buyer, expand="product"
+        )
+
+    def test_seller_orders(self):
+        self.assertConstantQueries("/api/v1/orders/seller-orders", self.artist)
+
+    def test_seller_orders_with_products(self):
+        self.assertConstantQueries(
+            "/api/v1/orders/seller-orders", self.artist, expand="product"
+        )
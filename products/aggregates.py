@@ -0,0 +1,67 @@
+from django.db.models import F, Q, Sum, Count, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from products.models import AGGREGATE_FIELDS, Product, Review, Favorite
+
+
+def adjust_aggregates(product_id, **deltas) -> None:
+    """Apply signed deltas in the database, e.g. review_count=1, rating_sum=4
+
+    F() keeps concurrent reviews and favorites from overwriting each other;
+    decrements stop at 0 for counters that already drifted low.
+    """
+
+    changes = {
+        field: F(field) + delta if delta > 0 else Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+        if delta
+    }
+
+    if changes:
+        Product.objects.filter(pk=product_id).update(**changes)
+
+
+def _subquery(model, aggregate):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(product=OuterRef("pk"))
+            .order_by()
+            .values("product")
+            .annotate(value=aggregate)
+            .values("value")
+        ),
+        0,
+    )
+
+
+def actual_aggregates() -> dict:
+    """The aggregates recomputed from the review and favorite rows"""
+
+    return {
+        "rating_sum": _subquery(Review, Sum("rating")),
+        "review_count": _subquery(Review, Count("id")),
+        "favorites_count": _subquery(Favorite, Count("id")),
+    }
+
+
+def drifted(queryset: QuerySet) -> QuerySet:
+    """Products whose stored aggregates no longer match their rows"""
+
+    mismatch = Q()
+
+    for field in AGGREGATE_FIELDS:
+        mismatch |= ~Q(**{field: F(f"actual_{field}")})
+
+    return queryset.annotate(
+        **{f"actual_{field}": value for field, value in actual_aggregates().items()}
+    ).filter(mismatch)
+
+
+def reconcile_aggregates(queryset: QuerySet) -> list:
+    """Repair drifted aggregates in one UPDATE; returns the repaired ids"""
+
+    product_ids = list(drifted(queryset).values_list("pk", flat=True))
+
+    if product_ids:
+        Product.objects.filter(pk__in=product_ids).update(**actual_aggregates())
+
+    return product_ids
@@ -0,0 +1,336 @@
+from datetime import datetime, time, timedelta
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from django.db import transaction
+from django.core.cache import cache
+from users.models import ArtistProfile
+from django.db.models.functions import Cast, Coalesce, TruncDate
+from django.db.models import F, Q, Sum, Case, When, Count, FloatField
+from products.models import (
+    MARKETPLACE_SCOPE,
+    Review,
+    Product,
+    Category,
+    Favorite,
+    AnalyticsRollup,
+    AnalyticsDailyBucket,
+)
+
+ROLLUP_LOCK_KEY = "analytics:rollup:lock"
+
+ROLLUP_FIELDS = (
+    "total_categories",
+    "total_products",
+    "total_reviews",
+    "total_favorites",
+    "category_counts",
+    "refreshed_at",
+)
+
+BUCKET_FIELDS = (
+    "new_products",
+    "new_reviews",
+    "rating_sum",
+    "new_favorites",
+    "refreshed_at",
+)
+
+# Every query here returns plain dicts via .values(), shaped like the
+# analytics schemas, so no model instances are built.
+
+
+def _totals() -> dict:
+    return {
+        "total_categories": Count("category", distinct=True),
+        "total_products": Count("id"),
+        "total_reviews": Coalesce(Sum("review_count"), 0),
+        "total_favorites": Coalesce(Sum("favorites_count"), 0),
+    }
+
+
+def _average(total, count):
+    return Case(
+        When(**{count: 0}, then=None),
+        default=Cast(total, FloatField()) / F(count),
+        output_field=FloatField(),
+    )
+
+
+def category_counts(artist_id) -> list[dict]:
+    """Product count per category, for the artist's products only"""
+
+    return list(
+        Category.objects.annotate(
+            product_count=Count("products", filter=Q(products__artist_id=artist_id))
+        )
+        .order_by("name")
+        .values(
+            "product_count",
+            category_id=F("id"),
+            category_name=F("name"),
+        )
+    )
+
+
+def product_stats(artist_id) -> list[dict]:
+    """Rating and favorite figures for each of the artist's products"""
+
+    return list(
+        Product.objects.filter(artist_id=artist_id)
+        .annotate(average_rating=_average("rating_sum", "review_count"))
+        .order_by("name", "id")
+        .values(
+            "average_rating",
+            "review_count",
+            "favorites_count",
+            product_id=F("id"),
+            product_name=F("name"),
+        )
+    )
+
+
+def totals(artist_id) -> dict:
+    """Store-wide totals in one aggregate query"""
+
+    return Product.objects.filter(artist_id=artist_id).aggregate(**_totals())
+
+
+def daily(scope: str) -> list[dict]:
+    return list(
+        AnalyticsDailyBucket.objects.filter(scope=scope)
+        .annotate(average_rating=_average("rating_sum", "new_reviews"))
+        .order_by("day")
+        .values(
+            "day",
+            "new_products",
+            "new_reviews",
+            "new_favorites",
+            "average_rating",
+        )
+    )
+
+
+def _is_fresh(rollup: dict | None) -> bool:
+    max_age = timedelta(seconds=settings.ANALYTICS_MAX_STALENESS)
+
+    return (
+        rollup is not None and rollup["refreshed_at"] >= timezone.now() - max_age
+    )
+
+
+def _get_rollups(artist_id) -> tuple[dict | None, dict | None]:
+    """The store's and the marketplace's rollup rows, in one query"""
+
+    rows = {
+        row["scope"]: row
+        for row in AnalyticsRollup.objects.filter(
+            scope__in=[str(artist_id), MARKETPLACE_SCOPE]
+        ).values("scope", *ROLLUP_FIELDS)
+    }
+
+    return rows.get(str(artist_id)), rows.get(MARKETPLACE_SCOPE)
+
+
+def _marketplace_totals() -> dict:
+    return {
+        **Product.objects.aggregate(**_totals()),
+        "total_categories": Category.objects.count(),
+    }
+
+
+def _live_summary(artist_id) -> dict:
+    return {**totals(artist_id), "refreshed_at": timezone.now()}
+
+
+def summary(artist_id) -> dict:
+    """The store's totals from its rollup, or live if it is too stale"""
+
+    rollup, _ = _get_rollups(artist_id)
+
+    return rollup if _is_fresh(rollup) else _live_summary(artist_id)
+
+
+def dashboard(artist_id) -> dict:
+    """Everything the analytics endpoints serve, from the rollups
+
+    Falls back to live queries when the rollups are older than
+    ANALYTICS_MAX_STALENESS, e.g. before the first beat run.
+    """
+
+    rollup, marketplace = _get_rollups(artist_id)
+
+    if _is_fresh(rollup) and _is_fresh(marketplace):
+        categories = [
+            {
+                **category,
+                "product_count": rollup["category_counts"].get(
+                    category["category_id"], 0
+                ),
+            }
+            for category in marketplace["category_counts"]
+        ]
+    else:
+        categories = category_counts(artist_id)
+        rollup = _live_summary(artist_id)
+        marketplace = {
+            **_marketplace_totals(),
+            "refreshed_at": rollup["refreshed_at"],
+        }
+
+    products = product_stats(artist_id)
+
+    return {
+        "categories": categories,
+        "ratings": products,
+        "favorites": products,
+        "summary": rollup,
+        "marketplace": marketplace,
+        "daily": daily(str(artist_id)),
+        "refreshed_at": min(rollup["refreshed_at"], marketplace["refreshed_at"]),
+    }
+
+
+def _rollups(now) -> list[AnalyticsRollup]:
+    """Every store's rollup plus the marketplace's, in four grouped queries"""
+
+    rollups = {}
+
+    def rollup_for(artist_id) -> AnalyticsRollup:
+        scope = str(artist_id)
+
+        if scope not in rollups:
+            rollups[scope] = AnalyticsRollup(scope=scope, refreshed_at=now)
+
+        return rollups[scope]
+
+    # stores without products still get a (zero) row
+    for artist_id in ArtistProfile.objects.values_list("id", flat=True):
+        rollup_for(artist_id)
+
+    for row in Product.objects.order_by().values("artist_id").annotate(**_totals()):
+        rollup = rollup_for(row.pop("artist_id"))
+
+        for field, value in row.items():
+            setattr(rollup, field, value)
+
+    for row in (
+        Product.objects.exclude(category=None)
+        .order_by()
+        .values("artist_id", "category_id")
+        .annotate(product_count=Count("id"))
+    ):
+        counts = rollup_for(row["artist_id"]).category_counts
+        counts[str(row["category_id"])] = row["product_count"]
+
+    marketplace = AnalyticsRollup(
+        scope=MARKETPLACE_SCOPE,
+        refreshed_at=now,
+        category_counts=[
+            {**category, "category_id": str(category["category_id"])}
+            for category in Category.objects.annotate(product_count=Count("products"))
+            .order_by("name")
+            .values(
+                "product_count",
+                category_id=F("id"),
+                category_name=F("name"),
+            )
+        ],
+    )
+
+    marketplace.total_categories = len(marketplace.category_counts)
+
+    for field, value in Product.objects.aggregate(**_totals()).items():
+        if field != "total_categories":
+            setattr(marketplace, field, value)
+
+    return [*rollups.values(), marketplace]
+
+
+def _buckets(now, since) -> list[AnalyticsDailyBucket]:
+    """Per-day activity since the given day, grouped per store in SQL"""
+
+    start = timezone.make_aware(datetime.combine(since, time.min))
+
+    activity = [
+        Product.objects.filter(created_at__gte=start)
+        .annotate(day=TruncDate("created_at"))
+        .order_by()
+        .values("artist_id", "day")
+        .annotate(new_products=Count("id")),
+        Review.objects.filter(created_at__gte=start)
+        .annotate(day=TruncDate("created_at"))
+        .order_by()
+        .values("day", artist_id=F("product__artist_id"))
+        .annotate(new_reviews=Count("id"), rating_sum=Sum("rating")),
+        Favorite.objects.filter(created_at__gte=start)
+        .annotate(day=TruncDate("created_at"))
+        .order_by()
+        .values("day", artist_id=F("product__artist_id"))
+        .annotate(new_favorites=Count("id")),
+    ]
+
+    buckets = {}
+
+    for rows in activity:
+        for row in rows:
+            artist_id, day = row.pop("artist_id"), row.pop("day")
+
+            for scope in (str(artist_id), MARKETPLACE_SCOPE):
+                bucket = buckets.setdefault(
+                    (scope, day),
+                    AnalyticsDailyBucket(scope=scope, day=day, refreshed_at=now),
+                )
+
+                for field, value in row.items():
+                    setattr(bucket, field, getattr(bucket, field) + value)
+
+    return list(buckets.values())
+
+
+def refresh_rollups() -> int:
+    """Recompute every rollup and the daily buckets in the retention window
+
+    Rows are upserted in one transaction, so readers keep seeing the
+    previous numbers until the new ones are committed.
+    """
+
+    now = timezone.now()
+    since = timezone.localdate(now) - timedelta(days=settings.ANALYTICS_ROLLUP_DAYS - 1)
+
+    rollups = _rollups(now)
+    buckets = _buckets(now, since)
+
+    with transaction.atomic():
+        AnalyticsRollup.objects.bulk_create(
+            rollups,
+            update_conflicts=True,
+            unique_fields=["scope"],
+            update_fields=ROLLUP_FIELDS,
+        )
+        # deleted stores
+        AnalyticsRollup.objects.filter(refreshed_at__lt=now).delete()
+
+        AnalyticsDailyBucket.objects.bulk_create(
+            buckets,
+            update_conflicts=True,
+            unique_fields=["scope", "day"],
+            update_fields=BUCKET_FIELDS,
+        )
+        # expired days, and days whose activity has since been deleted
+        AnalyticsDailyBucket.objects.filter(refreshed_at__lt=now).delete()
+
+    return len(rollups)
+
+
+@shared_task
+def refresh_analytics_rollups() -> int | None:
+    """Periodic task, see app/celery.py; overlapping runs are skipped"""
+
+    if not cache.add(ROLLUP_LOCK_KEY, 1, timeout=settings.ANALYTICS_ROLLUP_INTERVAL):
+        return None
+
+    try:
+        return refresh_rollups()
+    finally:
+        cache.delete(ROLLUP_LOCK_KEY)
@@ -1,13 +1,30 @@
 # router.py
 
+import zipfile
 from typing import List
 from ninja import Router, File
-from django.db.models import Q
-from typing import List, Optional
+from django.db.models import Q, Prefetch
+from typing import List, Literal, Optional
+from ninja.errors import HttpError
 from ninja.files import UploadedFile
 from django.db import IntegrityError
 from users.models import ArtistProfile
-from django.db.models import Count, Avg
+from products import analytics
+from products.search import search_products
+from products.imports import ProductImport, get_format, read_rows
+from products.bulk import STRIPE_FIELDS, apply_changes, bulk_update_products
+from utils.cache import cached_response, conditional_response
+from utils.images import process_staged, process_upload, stage_upload
+from utils.uploads import confirm_upload, create_presigned_upload
+from utils.pagination import get_page_size, paginate_keyset
+from products.rows import json_response, sparse_rows
+from products.exports import stream_json
+from products.projections import (
+    cards_enabled,
+    card_response,
+    get_card_body,
+    card_page_response,
+)
 from utils.stripe import _create_product, _update_product
 from products.models import Category, Product, Review, Favorite
 from utils.base import (
@@ -15,17 +32,36 @@ from utils.base import (
     AuthBearer,
     require_role,
     require_active,
+    get_principal,
+    get_artist_profile,
     get_authenticated_user,
 )
+from users.api.v1.schema import (
+    ArtistProfileSchema,
+    PresignedUploadSchema,
+    ImageUploadRequestSchema,
+    ImageUploadConfirmSchema,
+)
 from .schema import (
     StoreSchema,
     CategoryProductCountSchema,
     ProductRatingAnalyticsSchema,
     ProductFavoriteAnalyticsSchema,
     OverallAnalyticsSchema,
+    AnalyticsDashboardSchema,
     ProductSchema,
+    ProductSchemaTwo,
+    ProductPageSchema,
+    ProductBatchSchema,
+    ProductBatchRequestSchema,
+    PRODUCT_BATCH_MAX_IDS,
     ProductUpdateSchema,
+    ProductSearchSchema,
+    ProductSearchPageSchema,
     ProductCreateSchema,
+    ProductImportResultSchema,
+    ProductBulkUpdateSchema,
+    ProductBulkUpdateResultSchema,
     ReviewSchema,
     ReviewCreateSchema,
     FavoriteSchema,
@@ -40,66 +76,250 @@ bearer = AuthBearer()
 
 
 @router.get("/categories", response=List[CategorySchema])
+@cached_response("category", response=List[CategorySchema])
 def list_categories(request):
     return list(Category.objects.all())
 
 
-@router.get("/products", response=List[ProductSchema])
-def list_products(request):
-    return list(Product.objects.all())
+# Every catalog list is paged on this keyset; see utils.pagination
+PRODUCT_ORDERING = ("-created_at", "-id")
+
+
+@router.get("/products", response=ProductPageSchema)
+@cached_response("product", "category", "artist", response=ProductPageSchema)
+def list_products(
+    request,
+    cursor: str = None,  # type: ignore
+    page_size: int = None,  # type: ignore
+    fields: str = None,  # type: ignore
+    expand: str = None,  # type: ignore
+):
+    serializer = sparse_rows(ProductSchema, fields, expand)
+
+    if cards_enabled() and fields is None:
+        # Pre-rendered ProductSchema JSON, no joins or pydantic on the read path
+        rows, next_cursor = paginate_keyset(
+            Product.objects.values("created_at", "id", "card__body").order_by(
+                *PRODUCT_ORDERING
+            ),
+            cursor,
+            page_size,
+        )
+
+        return card_page_response(rows, next_cursor)
+
+    # ProductSchema columns only, serialized without models or pydantic
+    rows, next_cursor = paginate_keyset(
+        serializer.rows(Product.objects.order_by(*PRODUCT_ORDERING)),
+        cursor,
+        page_size,
+    )
+
+    return json_response(
+        {
+            "results": [serializer.serialize(row) for row in rows],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+@router.get("/products/export")
+def export_products(
+    request,
+    format: Literal["json", "ndjson"] = "json",
+    fields: str = None,  # type: ignore
+    expand: str = None,  # type: ignore
+):
+    """Every product, streamed as one JSON array or as NDJSON lines
+
+    Same rows and ?fields= / ?expand= as /products, without paging.
+    """
+
+    return stream_json(
+        sparse_rows(ProductSchema, fields, expand),
+        Product.objects.order_by(*PRODUCT_ORDERING),
+        format,
+    )
+
+
+def product_batch(ids: list[str], fields: str | None, expand: str | None):
+    """ProductSchema JSON for each id, in the order given
 
+    One query for all of them, as in_bulk() does, through the .values()
+    rows so ?fields= / ?expand= apply as on /products.
+    """
 
-@router.get("/products/seller", auth=bearer, response=List[ProductSchema] | dict)
+    if len(ids) > PRODUCT_BATCH_MAX_IDS:
+        raise HttpError(400, f"At most {PRODUCT_BATCH_MAX_IDS} ids per request")
+
+    product_ids = [parse_uuid(id.strip()) for id in ids]
+
+    serializer = sparse_rows(ProductSchema, fields, expand)
+
+    # keyed on the id column, which ?fields= may leave out of the output
+    rows = {
+        row["id"]: row
+        for row in serializer.rows(
+            Product.objects.filter(id__in=product_ids).order_by(), "id"
+        )
+    }
+
+    return json_response(
+        {
+            "results": [
+                serializer.serialize(rows[id]) if id in rows else None
+                for id in product_ids
+            ],
+            "missing": [str(id) for id in dict.fromkeys(product_ids) if id not in rows],
+        }
+    )
+
+
+@router.get("/products/batch", response=ProductBatchSchema)
+@cached_response("product", "category", "artist", response=ProductBatchSchema)
+def get_product_batch(
+    request,
+    ids: str,
+    fields: str = None,  # type: ignore
+    expand: str = None,  # type: ignore
+):
+    """Many products by id, e.g. ?ids=<id>,<id>; POST for long lists"""
+
+    return product_batch([id for id in ids.split(",") if id.strip()], fields, expand)
+
+
+@router.post("/products/batch", response=ProductBatchSchema)
+def post_product_batch(
+    request,
+    data: ProductBatchRequestSchema,
+    fields: str = None,  # type: ignore
+    expand: str = None,  # type: ignore
+):
+    return product_batch(data.ids, fields, expand)
+
+
+@router.get("/products/seller", auth=bearer, response=ProductPageSchema | dict)
 @require_active
 @require_role(is_artist=True)
-def list_seller_products(request):
-    user = get_authenticated_user(request)
+@conditional_response("product", "category", "artist")
+def list_seller_products(
+    request,
+    cursor: str = None,  # type: ignore
+    page_size: int = None,  # type: ignore
+    fields: str = None,  # type: ignore
+    expand: str = None,  # type: ignore
+):
+    serializer = sparse_rows(ProductSchema, fields, expand)
 
     try:
-        artist = ArtistProfile.objects.get(user=user)
-
-        return list(Product.objects.filter(artist=artist))
+        artist = get_artist_profile(request)
     except ArtistProfile.DoesNotExist:
         return {"error": "Artist profile not found.", "status": 404}
 
+    rows, next_cursor = paginate_keyset(
+        serializer.rows(
+            Product.objects.filter(artist=artist).order_by(*PRODUCT_ORDERING)
+        ),
+        cursor,
+        page_size,
+    )
+
+    return json_response(
+        {
+            "results": [serializer.serialize(row) for row in rows],
+            "next_cursor": next_cursor,
+        }
+    )
+
 
 @router.get("/products/store/{store_slug}", response=StoreSchema)
-def list_store_products(request, store_slug: str):
-    artist = ArtistProfile.objects.get(slug=store_slug)
+@cached_response("product", "category", "artist", response=StoreSchema)
+def list_store_products(
+    request,
+    store_slug: str,
+    cursor: str = None,  # type: ignore
+    page_size: int = None,  # type: ignore
+    fields: str = None,  # type: ignore
+    expand: str = None,  # type: ignore
+):
+    serializer = sparse_rows(ProductSchemaTwo, fields, expand)
 
-    products = list(Product.objects.filter(artist=artist))
+    artist = ArtistProfile.objects.select_related("user").get(slug=store_slug)
 
-    return {
-        "artist": artist,
-        "products": products,
-    }
+    rows, next_cursor = paginate_keyset(
+        serializer.rows(
+            Product.objects.filter(artist=artist).order_by(*PRODUCT_ORDERING)
+        ),
+        cursor,
+        page_size,
+    )
 
+    return json_response(
+        {
+            "artist": ArtistProfileSchema.from_orm(artist).model_dump(),
+            "products": [serializer.serialize(row) for row in rows],
+            "next_cursor": next_cursor,
+        }
+    )
 
-@router.get("/products/filter", response=dict)
+
+@router.get("/products/filter", response=ProductSearchPageSchema)
+@conditional_response("product", "category", "artist")
 def list_filtered_products(
     request,
     search: str = None,  # type: ignore
     category: str = "all",
+    cursor: str = None,  # type: ignore
+    page_size: int = None,  # type: ignore
+    fields: str = None,  # type: ignore
+    expand: str = None,  # type: ignore
 ):
+    serializer = sparse_rows(ProductSearchSchema, fields, expand)
+
     # Build query
     query = Q(is_active=True)
 
-    if search:
-        query &= Q(name__icontains=search)
-
     if category != "all":
         query &= Q(category__slug=category)
 
     products = Product.objects.filter(query)
 
-    return {
-        "results": [ProductSchema.from_orm(p) for p in products],
-    }
+    if search:
+        # ranked full-text + trigram matches, ordered by ("-rank_key", "-id")
+        products = search_products(products, search)
+    else:
+        products = products.order_by(*PRODUCT_ORDERING)
+
+    rows, next_cursor = paginate_keyset(serializer.rows(products), cursor, page_size)
+
+    return json_response(
+        {
+            "results": [serializer.serialize(row) for row in rows],
+            "next_cursor": next_cursor,
+        }
+    )
 
 
 @router.get("/products-by-category", response=List[CategoryWithProductsSchema])
-def products_by_category(request):
-    categories = Category.objects.all().prefetch_related("products")
+@cached_response(
+    "product", "category", "artist", response=List[CategoryWithProductsSchema]
+)
+def products_by_category(
+    request,
+    page_size: int = None,  # type: ignore
+):
+    """Every category with its newest products; /products/filter pages on"""
+
+    categories = Category.objects.prefetch_related(
+        Prefetch(
+            "products",
+            queryset=Product.objects.for_listing().order_by(*PRODUCT_ORDERING)[
+                : get_page_size(page_size)
+            ],
+            # a sliced prefetch must go to an attribute
+            to_attr="newest_products",
+        ),
+    )
 
     result = []
 
@@ -110,16 +330,91 @@ def products_by_category(request):
                 "name": category.name,
                 "slug": category.slug,
                 "products": [
-                    ProductSchema.from_orm(prod) for prod in category.products.all()  # type: ignore
+                    ProductSchema.from_orm(prod) for prod in category.newest_products  # type: ignore
                 ],
             }
         )
     return result
 
 
+@router.post("/products/import", auth=bearer, response=ProductImportResultSchema)
+@require_active
+@require_role(is_artist=True)
+def import_products(
+    request,
+    file: UploadedFile = File(...),  # type: ignore
+    images: Optional[UploadedFile] = File(default=None),  # type: ignore
+):
+    """Create products from a CSV or NDJSON file
+
+    Columns: name, description, price, stock, category (slug or name),
+    image (a file name in the images zip, or an existing storage key) and
+    is_active. Invalid rows are reported and skipped.
+    """
+
+    artist = get_artist_profile(request)
+
+    format = get_format(file.name or "")
+
+    archive = None
+
+    if images:
+        try:
+            archive = zipfile.ZipFile(images.file)
+        except zipfile.BadZipFile:
+            raise HttpError(400, "images must be a zip archive")
+
+    return ProductImport(artist, archive).run(read_rows(file.file, format))
+
+
+@router.post("/products/image-upload", auth=bearer, response=PresignedUploadSchema)
+@require_active
+@require_role(is_artist=True)
+def upload_product_image(request, data: ImageUploadRequestSchema):
+    """Step 1 of a direct upload: POST the file to the returned url
+
+    The token then goes to create_product (image_token) or to
+    /products/{product_id}/image.
+    """
+
+    return create_presigned_upload(
+        get_principal(request).id, "image", data.content_type
+    )
+
+
+@router.patch("/products/bulk", auth=bearer, response=ProductBulkUpdateResultSchema)
+@require_active
+@require_role(is_artist=True)
+def bulk_update(request, data: ProductBulkUpdateSchema):
+    """Change price, stock, status etc. of many products at once"""
+
+    return bulk_update_products(get_artist_profile(request), data.products)
+
+
 @router.get("/products/{product_id}", response=ProductSchema)
-def get_product(request, product_id: str):
-    return Product.objects.get(id=parse_uuid(product_id))
+@cached_response(
+    lambda product_id, **_: f"product:{parse_uuid(product_id)}",
+    "category",
+    "artist",
+    response=ProductSchema,
+)
+def get_product(
+    request,
+    product_id: str,
+    fields: str = None,  # type: ignore
+    expand: str = None,  # type: ignore
+):
+    serializer = sparse_rows(ProductSchema, fields, expand)
+
+    if cards_enabled() and fields is None:
+        return card_response(get_card_body(parse_uuid(product_id)))
+
+    row = serializer.rows(Product.objects.filter(id=parse_uuid(product_id))).first()
+
+    if row is None:
+        raise Product.DoesNotExist("Product matching query does not exist.")
+
+    return json_response(serializer.serialize(row))
 
 
 @router.post("/products", auth=bearer, response=dict)
@@ -128,29 +423,32 @@ def get_product(request, product_id: str):
 def create_product(
     request,
     data: ProductCreateSchema,
-    file: UploadedFile = File(...),  # type: ignore
+    file: Optional[UploadedFile] = File(default=None),  # type: ignore
 ):
-    user = get_authenticated_user(request)
+    artist = get_artist_profile(request)
+
+    if data.image_token:
+        staged_key = confirm_upload(data.image_token, artist.user_id, "image")
+    elif file:
+        staged_key = stage_upload(file)
+    else:
+        raise HttpError(400, "An image file or image_token is required")
 
-    artist = ArtistProfile.objects.get(user=user)
+    category = Category.objects.get(id=parse_uuid(data.category_id))
 
     product = Product.objects.create(
         artist=artist,
+        category=category,
         name=data.name,
         description=data.description,
         price=data.price,
         stock=data.stock,
     )
 
-    category = Category.objects.get(id=parse_uuid(data.category_id))
-
-    product.category = category
-
-    product.save()
-
-    product.image.save(file.name, file, save=True)
-
-    _create_product.delay(str(product.id))
+    # Stripe gets the product once its processed image exists
+    process_staged(
+        product, "image", staged_key, then=_create_product.si(str(product.id))
+    )
 
     return {"message": "Product created successfully"}
 
@@ -164,49 +462,64 @@ def update_product(
     data: ProductUpdateSchema,
     file: Optional[UploadedFile] = File(default=None),  # type: ignore
 ):
-    user = get_authenticated_user(request)
-
-    artist = ArtistProfile.objects.get(user=user)
+    artist = get_artist_profile(request)
 
     product = Product.objects.get(artist=artist, id=parse_uuid(product_id))
 
-    if data.name is not None:
-        product.name = data.name
-
-    if data.description is not None:
-        product.description = data.description
-
-    if data.price is not None:
-        product.price = float(data.price)  # type: ignore
-
-    if data.stock is not None:
-        product.stock = data.stock
-
-    if data.is_active is not None:
-        product.is_active = data.is_active
+    category = None
 
     if data.category_id is not None:
         category = Category.objects.get(id=parse_uuid(data.category_id))
 
-        product.category = category
+    changed = apply_changes(
+        product,
+        {
+            "name": data.name,
+            "description": data.description,
+            "price": data.price,
+            "stock": data.stock,
+            "is_active": data.is_active,
+            "category": category,
+        },
+    )
 
     product.save()
 
-    if file:
-        product.image.save(file.name, file, save=True)
+    # only Stripe-facing changes are synced, and only a price change reprices
+    sync = _update_product.si(str(product.id), reprice="price" in changed)
 
-    _update_product.delay(str(product.id))
+    if file:
+        process_upload(product, "image", file, then=sync)
+    elif changed & STRIPE_FIELDS:
+        sync.delay()
 
     return {"message": "Product updated successfully"}
 
 
+@router.post("/products/{product_id}/image", auth=bearer, response=dict)
+@require_active
+@require_role(is_artist=True)
+def confirm_product_image(request, product_id: str, data: ImageUploadConfirmSchema):
+    """Step 2 of a direct upload: attach the uploaded file"""
+
+    artist = get_artist_profile(request)
+
+    product = Product.objects.get(artist=artist, id=parse_uuid(product_id))
+
+    staged_key = confirm_upload(data.token, artist.user_id, "image")
+
+    process_staged(
+        product, "image", staged_key, then=_update_product.si(str(product.id), False)
+    )
+
+    return {"message": "Product image updated successfully"}
+
+
 @router.delete("/products/{product_id}", auth=bearer, response=dict)
 @require_active
 @require_role(is_artist=True)
 def delete_product(request, product_id: str):
-    user = get_authenticated_user(request)
-
-    artist = ArtistProfile.objects.get(user=user)
+    artist = get_artist_profile(request)
 
     product = Product.objects.get(artist=artist, id=parse_uuid(product_id))
 
@@ -219,9 +532,7 @@ def delete_product(request, product_id: str):
 @require_active
 @require_role(is_artist=True)
 def list_all_product_reviews_for_seller(request):
-    user = get_authenticated_user(request)
-
-    artist_profile = ArtistProfile.objects.get(user=user)
+    artist_profile = get_artist_profile(request)
 
     reviews = Review.objects.filter(
         product__artist=artist_profile,
@@ -271,7 +582,7 @@ def get_review(request, review_id: str):
 def create_review(request, data: ReviewCreateSchema):
     user = get_authenticated_user(request)
 
-    artist = ArtistProfile.objects.get(user=user)
+    artist = get_artist_profile(request)
 
     product = Product.objects.get(artist=artist, id=parse_uuid(data.product_id))
 
@@ -317,17 +628,34 @@ def delete_review(request, review_id: str):
     return {"message": "Review deleted successfully"}
 
 
-@router.get("/favorites", auth=bearer, response=List[ProductSchema])
+@router.get("/favorites", auth=bearer, response=ProductPageSchema)
 @require_active
-def list_favorites(request):
-    user = get_authenticated_user(request)
+def list_favorites(
+    request,
+    cursor: str = None,  # type: ignore
+    page_size: int = None,  # type: ignore
+    fields: str = None,  # type: ignore
+    expand: str = None,  # type: ignore
+):
+    principal = get_principal(request)
+
+    serializer = sparse_rows(ProductSchema, fields, expand)
 
     # Get favorited products through the reverse relation
     favorited_products = Product.objects.filter(
-        favorited_by__user=user,
-    ).select_related("artist", "category")
+        favorited_by__user_id=principal.id,
+    ).order_by(*PRODUCT_ORDERING)
+
+    rows, next_cursor = paginate_keyset(
+        serializer.rows(favorited_products), cursor, page_size
+    )
 
-    return favorited_products
+    return json_response(
+        {
+            "results": [serializer.serialize(row) for row in rows],
+            "next_cursor": next_cursor,
+        }
+    )
 
 
 @router.post("/favorites", auth=bearer, response=dict)
@@ -374,17 +702,7 @@ def delete_favorite(request, data: FavoriteCreateSchema):
 @require_active
 @require_role(is_artist=True)
 def products_count_per_category(request):
-    categories = Category.objects.annotate(product_count=Count("products"))
-    result = []
-    for cat in categories:
-        result.append(
-            {
-                "category_id": cat.id,
-                "category_name": cat.name,
-                "product_count": cat.product_count,  # type: ignore
-            }
-        )
-    return result
+    return analytics.category_counts(get_artist_profile(request).id)
 
 
 @router.get(
@@ -395,20 +713,7 @@ def products_count_per_category(request):
 @require_active
 @require_role(is_artist=True)
 def product_ratings_analytics(request):
-    products = Product.objects.annotate(
-        average_rating=Avg("reviews__rating"), review_count=Count("reviews")
-    )
-    result = []
-    for prod in products:
-        result.append(
-            {
-                "product_id": prod.id,
-                "product_name": prod.name,
-                "average_rating": prod.average_rating,  # type: ignore
-                "review_count": prod.review_count,  # type: ignore
-            }
-        )
-    return result
+    return analytics.product_stats(get_artist_profile(request).id)
 
 
 @router.get(
@@ -419,31 +724,18 @@ def product_ratings_analytics(request):
 @require_active
 @require_role(is_artist=True)
 def product_favorites_analytics(request):
-    products = Product.objects.annotate(favorites_count=Count("favorited_by"))
-    result = []
-    for prod in products:
-        result.append(
-            {
-                "product_id": prod.id,
-                "product_name": prod.name,
-                "favorites_count": prod.favorites_count,  # type: ignore
-            }
-        )
-    return result
+    return analytics.product_stats(get_artist_profile(request).id)
 
 
 @router.get("/analytics/summary", auth=bearer, response=OverallAnalyticsSchema)
 @require_active
 @require_role(is_artist=True)
 def overall_analytics(request):
-    total_categories = Category.objects.count()
-    total_products = Product.objects.count()
-    total_reviews = Review.objects.count()
-    total_favorites = Favorite.objects.count()
-
-    return {
-        "total_categories": total_categories,
-        "total_products": total_products,
-        "total_reviews": total_reviews,
-        "total_favorites": total_favorites,
-    }
+    return analytics.summary(get_artist_profile(request).id)
+
+
+@router.get("/analytics/dashboard", auth=bearer, response=AnalyticsDashboardSchema)
+@require_active
+@require_role(is_artist=True)
+def analytics_dashboard(request):
+    return analytics.dashboard(get_artist_profile(request).id)
@@ -1,7 +1,9 @@
 import uuid
+from decimal import Decimal
 from typing import Optional, List
-from pydantic import field_serializer
+from pydantic import Field, field_serializer
 from ninja import ModelSchema, Schema
+from utils.images import variant_urls
 from users.api.v1.schema import ArtistProfileSchema
 from products.models import Category, Product, Review, Favorite
 
@@ -21,9 +23,17 @@ class ProductSchema(ModelSchema):
         model = Product
         fields = "__all__"
         depth = 1
+        exclude = ["search_vector", "rating_sum"]
 
-    category: CategorySchema
+    # null once the category is deleted (on_delete=SET_NULL)
+    category: Optional[CategorySchema] = None
     artist: ArtistProfileSchema
+    average_rating: Optional[float] = None
+    image_variants: dict = {}
+
+    @staticmethod
+    def resolve_image_variants(obj):
+        return variant_urls(obj.image_variants)
 
 
 class ProductSchemaTwo(ModelSchema):
@@ -31,13 +41,58 @@ class ProductSchemaTwo(ModelSchema):
         model = Product
         fields = "__all__"
         depth = 1
+        exclude = ["search_vector", "rating_sum"]
+
+    category: Optional[CategorySchema] = None
+    average_rating: Optional[float] = None
+    image_variants: dict = {}
+
+    @staticmethod
+    def resolve_image_variants(obj):
+        return variant_urls(obj.image_variants)
+
+
+class ProductSearchSchema(ProductSchema):
+    class Meta:
+        model = Product
+        fields = "__all__"
+        depth = 1
+        exclude = ["search_vector", "rating_sum"]
+
+    rank: Optional[float] = None
+    name_highlight: Optional[str] = None
+    description_highlight: Optional[str] = None
 
-    category: CategorySchema
+
+class ProductPageSchema(Schema):
+    results: List[ProductSchema]
+    next_cursor: Optional[str] = None
+
+
+# Ids per GET/POST /products/batch request
+PRODUCT_BATCH_MAX_IDS = 100
+
+
+class ProductBatchRequestSchema(Schema):
+    ids: List[str] = Field(max_length=PRODUCT_BATCH_MAX_IDS)
+
+
+class ProductBatchSchema(Schema):
+    # in request order, null for ids with no product; those are also
+    # listed in missing
+    results: List[Optional[ProductSchema]]
+    missing: List[str]
+
+
+class ProductSearchPageSchema(Schema):
+    results: List[ProductSearchSchema]
+    next_cursor: Optional[str] = None
 
 
 class StoreSchema(Schema):
     artist: ArtistProfileSchema
     products: List[ProductSchemaTwo]
+    next_cursor: Optional[str] = None
 
 
 class ProductCreateSchema(Schema):
@@ -46,6 +101,8 @@ class ProductCreateSchema(Schema):
     price: float
     stock: int
     category_id: str
+    # from a confirmed direct upload, instead of the file field
+    image_token: Optional[str] = None
 
 
 class ProductUpdateSchema(Schema):
@@ -57,6 +114,47 @@ class ProductUpdateSchema(Schema):
     is_active: Optional[bool] = None
 
 
+class ProductBulkUpdateItemSchema(Schema):
+    id: str
+    name: Optional[str] = Field(default=None, min_length=1, max_length=255)
+    description: Optional[str] = None
+    price: Optional[Decimal] = Field(
+        default=None, gt=0, max_digits=10, decimal_places=2
+    )
+    stock: Optional[int] = Field(default=None, ge=0)
+    category_id: Optional[str] = None
+    is_active: Optional[bool] = None
+
+
+class ProductBulkUpdateSchema(Schema):
+    products: List[ProductBulkUpdateItemSchema] = Field(min_length=1, max_length=1000)
+
+
+class ProductBulkUpdateResultSchema(Schema):
+    updated: int
+    synced: int
+
+
+class ProductImportRowSchema(Schema):
+    name: str = Field(min_length=1, max_length=255)
+    description: str
+    price: Decimal = Field(gt=0, max_digits=10, decimal_places=2)
+    stock: int = Field(default=1, ge=0)
+    category: str  # slug or name
+    image: Optional[str] = None  # file name in the zip, or a storage key
+    is_active: bool = True
+
+
+class ProductImportErrorSchema(Schema):
+    row: int
+    errors: List[str]
+
+
+class ProductImportResultSchema(Schema):
+    created: int
+    errors: List[ProductImportErrorSchema]
+
+
 class ReviewSchema(ModelSchema):
     class Meta:
         model = Review
@@ -96,6 +194,7 @@ class CategoryWithProductsSchema(Schema):
 import uuid
 from typing import Optional
 from ninja import Schema
+from datetime import date, datetime
 
 
 class CategoryProductCountSchema(Schema):
@@ -122,3 +221,22 @@ class OverallAnalyticsSchema(Schema):
     total_products: int
     total_reviews: int
     total_favorites: int
+    refreshed_at: Optional[datetime] = None
+
+
+class DailyAnalyticsSchema(Schema):
+    day: date
+    new_products: int
+    new_reviews: int
+    new_favorites: int
+    average_rating: Optional[float] = None
+
+
+class AnalyticsDashboardSchema(Schema):
+    categories: List[CategoryProductCountSchema]
+    ratings: List[ProductRatingAnalyticsSchema]
+    favorites: List[ProductFavoriteAnalyticsSchema]
+    summary: OverallAnalyticsSchema
+    marketplace: OverallAnalyticsSchema
+    daily: List[DailyAnalyticsSchema]
+    refreshed_at: datetime
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import analytics  # noqa: F401  registers the rollup task
+        from . import blobs  # noqa: F401  registers the blob collector
+        from . import feeds  # noqa: F401  registers the feed export
+        from utils import cache  # noqa: F401  registers the cache check
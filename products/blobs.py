@@ -0,0 +1,135 @@
+from datetime import timedelta
+from collections import Counter
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+from django.db import models, transaction
+from django.db.models import F, Case, When
+from django.db.models.functions import Greatest
+from django.core.files.storage import default_storage
+from utils.storage import hashed_prefix
+from products.models import ImageBlob
+
+IMAGE_BLOB_GC_BATCH_SIZE = 500
+
+# Image fields are the only references to blobs; ref_count is kept by
+# utils.images (attach and replace) and products.signals (delete).
+
+
+def claim(key: str) -> ImageBlob | None:
+    """Take a reference to an existing blob, or None if there is none
+
+    Taking the reference and finding the blob is one UPDATE, so a blob
+    can't be collected between the two.
+    """
+
+    if not ImageBlob.objects.filter(key=key).update(
+        ref_count=F("ref_count") + 1, released_at=None
+    ):
+        return None
+
+    return ImageBlob.objects.get(key=key)
+
+
+def retain(*names: str) -> None:
+    """Count new references from the given image field values"""
+
+    for key, count in Counter(filter(None, map(hashed_prefix, names))).items():
+        ImageBlob.objects.filter(key=key).update(
+            ref_count=F("ref_count") + count, released_at=None
+        )
+
+
+def release(*names: str) -> None:
+    """Drop references from the given image field values"""
+
+    now = timezone.now()
+
+    for key, count in Counter(filter(None, map(hashed_prefix, names))).items():
+        ImageBlob.objects.filter(key=key).update(
+            ref_count=Greatest(F("ref_count") - count, 0),
+            released_at=Case(
+                When(ref_count__lte=count, then=now),
+                default=F("released_at"),
+            ),
+        )
+
+
+def _image_fields():
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.ImageField):
+                yield model, field.name
+
+
+def referenced(blobs: list[ImageBlob]) -> Counter:
+    """How many image fields still point at each of the given blobs
+
+    Bulk writes skip the signals that keep ref_count, so the collector
+    checks the tables before deleting anything.
+    """
+
+    names = {
+        variant[format]: blob.key
+        for blob in blobs
+        for variant in blob.variants.values()
+        for format in ("avif", "webp")
+        if format in variant
+    }
+
+    found = Counter()
+
+    for model, field_name in _image_fields():
+        found.update(
+            names[name]
+            for name in model.objects.filter(
+                **{f"{field_name}__in": list(names)}
+            ).values_list(field_name, flat=True)
+        )
+
+    return found
+
+
+def collect_blobs() -> int:
+    """Delete blobs unreferenced for longer than IMAGE_BLOB_GRACE
+
+    Returns the number of blobs deleted.
+    """
+
+    cutoff = timezone.now() - timedelta(seconds=settings.IMAGE_BLOB_GRACE)
+
+    with transaction.atomic():
+        # skip_locked leaves blobs being claimed right now to the next run
+        blobs = list(
+            ImageBlob.objects.select_for_update(skip_locked=True).filter(
+                ref_count=0, released_at__lt=cutoff
+            )[:IMAGE_BLOB_GC_BATCH_SIZE]
+        )
+
+        keep = referenced(blobs)
+        garbage = [blob for blob in blobs if blob.key not in keep]
+
+        # drifted counts
+        for key, count in keep.items():
+            ImageBlob.objects.filter(key=key).update(ref_count=count, released_at=None)
+
+        # Objects go first, while the rows are still locked: a concurrent
+        # claim() waits for this transaction, then finds no row and renders
+        # the image again.
+        for blob in garbage:
+            for variant in blob.variants.values():
+                for format in ("avif", "webp"):
+                    if format in variant:
+                        default_storage.delete(variant[format])
+
+        ImageBlob.objects.filter(key__in=[blob.key for blob in garbage]).delete()
+
+    return len(garbage)
+
+
+@shared_task
+def collect_image_blobs() -> int:
+    """Periodic task, see app/celery.py"""
+
+    return collect_blobs()
@@ -0,0 +1,125 @@
+from decimal import Decimal
+from functools import partial
+from django.db import models, transaction
+from django.utils import timezone
+from ninja.errors import HttpError
+from utils.base import parse_uuid
+from utils.stripe import _update_products
+from users.models import ArtistProfile
+from products.models import Category, Product
+from products.signals import products_changed
+
+BULK_UPDATE_BATCH_SIZE = 500
+
+# Fields mirrored on Stripe; changing any of them needs a sync
+STRIPE_FIELDS = {"name", "description", "price", "image"}
+
+CENT = Decimal("0.01")
+
+
+def apply_changes(product: Product, changes: dict) -> set[str]:
+    """Set the given fields that differ from the product's values
+
+    None means "leave unchanged". Returns the names of the changed fields.
+    """
+
+    changed = set()
+
+    for field, value in changes.items():
+        if value is None:
+            continue
+
+        if field == "price":
+            value = Decimal(str(value)).quantize(CENT)
+
+        attname = Product._meta.get_field(field).attname
+        new = value.pk if isinstance(value, models.Model) else value
+
+        if getattr(product, attname) != new:
+            setattr(product, field, value)
+            changed.add(field)
+
+    return changed
+
+
+def bulk_update_products(artist: ArtistProfile, items: list) -> dict:
+    """Apply ProductBulkUpdateItemSchema changes in one transaction
+
+    Either every item applies or none does. Stripe is synced in one job,
+    and only for products whose Stripe-facing fields changed.
+    """
+
+    ids = [parse_uuid(item.id) for item in items]
+
+    if len(set(ids)) != len(ids):
+        raise HttpError(400, "Each product may only appear once")
+
+    category_ids = {parse_uuid(item.category_id) for item in items if item.category_id}
+
+    with transaction.atomic():
+        products = (
+            Product.objects.filter(artist=artist).select_for_update().in_bulk(ids)
+        )
+
+        missing = [str(id) for id in ids if id not in products]
+
+        if missing:
+            raise HttpError(404, f"Products not found: {', '.join(missing)}")
+
+        categories = Category.objects.in_bulk(category_ids)
+
+        missing = [str(id) for id in category_ids if id not in categories]
+
+        if missing:
+            raise HttpError(404, f"Categories not found: {', '.join(missing)}")
+
+        updated = []
+        fields = set()
+        synced = []
+        repriced = []
+
+        for id, item in zip(ids, items):
+            product = products[id]
+
+            changed = apply_changes(
+                product,
+                {
+                    "name": item.name,
+                    "description": item.description,
+                    "price": item.price,
+                    "stock": item.stock,
+                    "is_active": item.is_active,
+                    "category": categories.get(parse_uuid(item.category_id))
+                    if item.category_id
+                    else None,
+                },
+            )
+
+            if not changed:
+                continue
+
+            # bulk_update does not apply auto_now
+            product.updated_at = timezone.now()
+
+            updated.append(product)
+            fields |= changed
+
+            if changed & STRIPE_FIELDS:
+                synced.append(str(id))
+
+            if "price" in changed:
+                repriced.append(str(id))
+
+        if updated:
+            Product.objects.bulk_update(
+                updated,
+                [*fields, "updated_at"],
+                batch_size=BULK_UPDATE_BATCH_SIZE,
+            )
+
+            products_changed([product.id for product in updated], fields)
+
+        if synced:
+            transaction.on_commit(partial(_update_products.delay, synced, repriced))
+
+    return {"updated": len(updated), "synced": len(synced)}
@@ -0,0 +1,62 @@
+from typing import Iterator
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from utils.renderers import dumps
+from products.rows import RowSerializer
+
+# Rows fetched per round trip (a server-side cursor on PostgreSQL), and
+# rows serialized per chunk written to the client
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_WRITE_SIZE = 200
+
+EXPORT_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _chunk(lines: list[bytes], ndjson: bool, first: bool) -> bytes:
+    if ndjson:
+        return b"\n".join(lines) + b"\n"
+
+    return (b"" if first else b",") + b",".join(lines)
+
+
+def iter_json(
+    serializer: RowSerializer, queryset: QuerySet, ndjson: bool
+) -> Iterator[bytes]:
+    """The queryset as a JSON array (or NDJSON lines), a few rows at a time
+
+    Only one fetch chunk of rows is held in memory, however large the
+    catalog; the opening bracket goes out before the query runs.
+    """
+
+    if not ndjson:
+        yield b"["
+
+    first = True
+    lines = []
+
+    for row in serializer.rows(queryset).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        lines.append(dumps(serializer.serialize(row)))
+
+        if len(lines) >= EXPORT_WRITE_SIZE:
+            yield _chunk(lines, ndjson, first)
+
+            first = False
+            lines = []
+
+    if lines:
+        yield _chunk(lines, ndjson, first)
+
+    if not ndjson:
+        yield b"]"
+
+
+def stream_json(
+    serializer: RowSerializer, queryset: QuerySet, format: str
+) -> StreamingHttpResponse:
+    return StreamingHttpResponse(
+        iter_json(serializer, queryset, format == "ndjson"),
+        content_type=f"{EXPORT_FORMATS[format]}; charset=utf-8",
+    )
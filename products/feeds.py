@@ -0,0 +1,328 @@
+import io
+import csv
+import heapq
+import tempfile
+from itertools import groupby, islice
+from operator import itemgetter
+from typing import Iterable, Iterator
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from products.models import Product
+from utils.renderers import dumps, loads
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # the feed is written as CSV only
+    pyarrow = None
+
+FEED_PREFIX = "feeds/products/"
+FEED_MANIFEST = f"{FEED_PREFIX}manifest.json"
+FEED_LOCK_KEY = "products:feed:lock"
+
+# Rows fetched per round trip, and rows per Parquet record batch
+FEED_CHUNK_SIZE = 2000
+FEED_BATCH_SIZE = 10000
+
+# Products saved in a transaction that commits after an export started
+# can carry an earlier updated_at; the next run looks back this far.
+FEED_WATERMARK_OVERLAP = timedelta(minutes=5)
+
+# Shopping feed attributes. Image links are the storage's URLs, which only
+# stay valid in a feed with public media (AWS_PUBLIC_MEDIA).
+FEED_COLUMNS = (
+    "id",
+    "title",
+    "description",
+    "link",
+    "image_link",
+    "price",
+    "availability",
+    "brand",
+    "product_type",
+    "updated_at",
+)
+
+FEED_VALUES = (
+    "id",
+    "name",
+    "slug",
+    "description",
+    "price",
+    "stock",
+    "image",
+    "updated_at",
+    "category__name",
+    "artist__store_name",
+)
+
+PARQUET_SCHEMA = (
+    pyarrow.schema([(column, pyarrow.string()) for column in FEED_COLUMNS])
+    if pyarrow
+    else None
+)
+
+
+def feed_row(row: dict) -> dict:
+    return {
+        "id": str(row["id"]),
+        "title": row["name"],
+        "description": row["description"],
+        "link": f"{settings.BUYER_FRONTEND_URL}/products/{row['slug']}",
+        "image_link": default_storage.url(row["image"]) if row["image"] else "",
+        "price": f"{row['price']} {settings.FEED_CURRENCY}",
+        "availability": "in_stock" if row["stock"] else "out_of_stock",
+        "brand": row["artist__store_name"],
+        "product_type": row["category__name"] or "",
+        "updated_at": row["updated_at"].isoformat(),
+    }
+
+
+def feed_rows(queryset) -> Iterator[dict]:
+    """Feed rows for the queryset, in id order
+
+    Feed files are kept sorted by id so they can be merged as streams. The
+    database orders UUIDs bytewise, which is the order of their strings.
+    """
+
+    rows = queryset.order_by("id").values(*FEED_VALUES)
+
+    for row in rows.iterator(chunk_size=FEED_CHUNK_SIZE):
+        yield feed_row(row)
+
+
+def _batches(rows: Iterable[dict]) -> Iterator[list[dict]]:
+    rows = iter(rows)
+
+    while batch := list(islice(rows, FEED_BATCH_SIZE)):
+        yield batch
+
+
+def _read_csv(name: str) -> Iterator[dict]:
+    with default_storage.open(name, "rb") as file:
+        yield from csv.DictReader(io.TextIOWrapper(file, encoding="utf-8", newline=""))
+
+
+def _save(name: str, file) -> str:
+    file.seek(0)
+
+    return default_storage.save(name, File(file))
+
+
+def _write_csv(name: str, rows: Iterable[dict]) -> tuple[str | None, int]:
+    """Write the rows to storage as CSV; no file is written for no rows"""
+
+    count = 0
+
+    with tempfile.TemporaryFile() as file:
+        text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+        writer = csv.DictWriter(text, FEED_COLUMNS)
+        writer.writeheader()
+
+        for batch in _batches(rows):
+            writer.writerows(batch)
+            count += len(batch)
+
+        text.flush()
+        text.detach()
+
+        return (_save(name, file) if count else None), count
+
+
+def _write_feed(stamp: str, rows: Iterable[dict]) -> tuple[dict, int]:
+    """Write the rows to storage as CSV and, with pyarrow, Parquet"""
+
+    count = 0
+
+    with tempfile.TemporaryFile() as csv_file, tempfile.TemporaryFile() as parquet_file:
+        text = io.TextIOWrapper(csv_file, encoding="utf-8", newline="")
+        writer = csv.DictWriter(text, FEED_COLUMNS)
+        writer.writeheader()
+
+        parquet = (
+            pyarrow.parquet.ParquetWriter(parquet_file, PARQUET_SCHEMA)
+            if pyarrow
+            else None
+        )
+
+        for batch in _batches(rows):
+            writer.writerows(batch)
+
+            if parquet:
+                parquet.write_batch(
+                    pyarrow.RecordBatch.from_pylist(batch, schema=PARQUET_SCHEMA)
+                )
+
+            count += len(batch)
+
+        text.flush()
+        text.detach()
+
+        files = {"csv": _save(f"{FEED_PREFIX}feed-{stamp}.csv", csv_file)}
+
+        if parquet:
+            parquet.close()
+
+            files["parquet"] = _save(f"{FEED_PREFIX}feed-{stamp}.parquet", parquet_file)
+
+    return files, count
+
+
+def _ranked(name: str, rank: int) -> Iterator[tuple]:
+    for row in _read_csv(name):
+        yield row["id"], rank, row
+
+
+def _merge(names: list[str], live: Iterator[str]) -> Iterator[dict]:
+    """The newest row for every live product, from files oldest first
+
+    Rows of products that were deleted or deactivated are dropped. A live
+    product in none of the files (changed without its updated_at moving)
+    is read from the database.
+    """
+
+    merged = heapq.merge(
+        *(_ranked(name, -position) for position, name in enumerate(names)),
+        key=itemgetter(0, 1),
+    )
+    newest = ((id, next(group)[2]) for id, group in groupby(merged, itemgetter(0)))
+
+    row_id, row = next(newest, (None, None))
+
+    for product_id in live:
+        while row_id is not None and row_id < product_id:
+            row_id, row = next(newest, (None, None))
+
+        if row_id == product_id:
+            yield row
+        else:
+            yield from feed_rows(Product.objects.filter(id=product_id))
+
+
+def read_manifest() -> dict | None:
+    if not default_storage.exists(FEED_MANIFEST):
+        return None
+
+    with default_storage.open(FEED_MANIFEST, "rb") as file:
+        return loads(file.read())
+
+
+def _write_manifest(manifest: dict) -> None:
+    # S3 overwrites in place, other backends would save under a new name
+    if default_storage.get_available_name(FEED_MANIFEST) != FEED_MANIFEST:
+        default_storage.delete(FEED_MANIFEST)
+
+    default_storage.save(FEED_MANIFEST, ContentFile(dumps(manifest)))
+
+
+def _delete_unreferenced(previous: dict | None, manifest: dict) -> None:
+    if previous is None:
+        return
+
+    keep = {*manifest["files"].values(), *manifest["partitions"]}
+
+    for name in {*previous["files"].values(), *previous["partitions"]} - keep:
+        default_storage.delete(name)
+
+
+def write_partition(full: bool = False) -> dict:
+    """Write the products changed since the watermark as a partition
+
+    The partition is a CSV file of feed rows, listed in the manifest until
+    compact_feed() merges it into the feed. A full export (also the first
+    one) writes every product, which supersedes the earlier partitions.
+    """
+
+    previous = read_manifest()
+    started = timezone.now()
+    stamp = started.strftime("%Y%m%dT%H%M%S%fZ")
+
+    manifest = previous or {"files": {}, "partitions": [], "rows": 0}
+
+    if full or previous is None:
+        products = Product.objects.all()
+        manifest = {**manifest, "partitions": []}
+    else:
+        products = Product.objects.filter(
+            updated_at__gt=parse_datetime(previous["watermark"])
+        )
+
+    partition, changed = _write_csv(
+        f"{FEED_PREFIX}partitions/{stamp}.csv", feed_rows(products)
+    )
+
+    manifest = {
+        **manifest,
+        "columns": FEED_COLUMNS,
+        "watermark": (started - FEED_WATERMARK_OVERLAP).isoformat(),
+        "partitions": [*manifest["partitions"], *filter(None, [partition])],
+        "changed": changed,
+    }
+
+    _write_manifest(manifest)
+    _delete_unreferenced(previous, manifest)
+
+    return manifest
+
+
+def compact_feed() -> dict | None:
+    """Merge the feed and its partitions into a new feed
+
+    Only the live product ids are read from the database; every other row
+    is copied from the files. The manifest then points at the new feed.
+    """
+
+    previous = read_manifest()
+
+    if previous is None:
+        return None
+
+    started = timezone.now()
+    stamp = started.strftime("%Y%m%dT%H%M%S%fZ")
+
+    live = (
+        str(id)
+        for id in Product.objects.filter(is_active=True)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .iterator(chunk_size=FEED_CHUNK_SIZE)
+    )
+
+    names = [*filter(None, [previous["files"].get("csv")]), *previous["partitions"]]
+
+    files, rows = _write_feed(stamp, _merge(names, live))
+
+    manifest = {
+        **previous,
+        "files": files,
+        "partitions": [],
+        "rows": rows,
+        "compacted_at": started.isoformat(),
+    }
+
+    _write_manifest(manifest)
+    _delete_unreferenced(previous, manifest)
+
+    return manifest
+
+
+@shared_task
+def export_product_feed(full: bool = False, compact: bool = True) -> dict | None:
+    """Periodic task, see app/celery.py; overlapping runs are skipped"""
+
+    if not cache.add(FEED_LOCK_KEY, 1, timeout=settings.FEED_EXPORT_LOCK_TIMEOUT):
+        return None
+
+    try:
+        manifest = write_partition(full)
+
+        return compact_feed() if compact else manifest
+    finally:
+        cache.delete(FEED_LOCK_KEY)
@@ -0,0 +1,340 @@
+import io
+import csv
+import json
+import zipfile
+from PIL import Image
+from pydantic import ValidationError
+from typing import Iterator
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from ninja.errors import HttpError
+from celery import chain
+from utils.stripe import _create_products
+from utils.storage import hashed_prefix
+from utils.images import blob_key, content_digest, process_image, staging_key
+from users.models import ArtistProfile
+from products.blobs import retain
+from products.models import Category, ImageBlob, Product
+from products.api.v1.schema import ProductImportRowSchema
+from products.signals import products_changed
+
+IMPORT_BATCH_SIZE = 500
+IMPORT_MAX_ROWS = 10_000
+IMPORT_MAX_IMAGE_SIZE = 10 * 1024 * 1024
+
+# Storage keys an import may point product images at
+IMPORT_IMAGE_PREFIXES = ("products/",)
+
+IMPORT_FORMATS = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
+# Room left in Product.slug for a "-<n>" collision suffix
+SLUG_BASE_LENGTH = Product._meta.get_field("slug").max_length - 8
+
+
+def get_format(file_name: str) -> str:
+    for extension, format in IMPORT_FORMATS.items():
+        if file_name.lower().endswith(extension):
+            return format
+
+    raise HttpError(400, "Unsupported file type, expected .csv or .ndjson")
+
+
+def _is_utf8(row: dict) -> bool:
+    cells = [key for key in row if key]
+
+    for value in row.values():
+        cells.extend(value if isinstance(value, list) else filter(None, [value]))
+
+    try:
+        "".join(cells).encode("utf-8")
+    except UnicodeEncodeError:
+        return False
+
+    return True
+
+
+def read_rows(file, format: str) -> Iterator[tuple[int, dict | Exception]]:
+    """Yield (row number, raw row) one line at a time"""
+
+    if format == "csv":
+        # undecodable bytes are kept as surrogates and fail their own row
+        reader = csv.DictReader(
+            io.TextIOWrapper(file, encoding="utf-8-sig", errors="surrogateescape")
+        )
+        number = 0
+
+        while True:
+            number += 1
+
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield number, e
+                continue
+
+            if not _is_utf8(row):
+                yield number, ValueError("Not UTF-8 encoded")
+                continue
+
+            # blank cells are missing values; None collects extra cells
+            yield number, {
+                key: value for key, value in row.items() if key and value != ""
+            }
+
+    for number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, e
+            continue
+
+        yield number, row if isinstance(row, dict) else ValueError("Not an object")
+
+
+def _errors(error: ValidationError) -> list[str]:
+    return [
+        f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}"
+        for e in error.errors()
+    ]
+
+
+class ProductImport:
+    """One seller's import: validated rows are inserted in batches
+
+    Each batch commits on its own, so a bad batch (or row) never rolls back
+    the rows already imported.
+    """
+
+    def __init__(self, artist: ArtistProfile, images: zipfile.ZipFile | None = None):
+        self.artist = artist
+        self.images = images
+        self.categories: dict[str, Category | None] = {}
+        self.created: list[str] = []
+        # product id -> staged key of its zipped image
+        self.staged: dict = {}
+        self.errors: list[dict] = []
+
+    def error(self, row: int, *messages: str) -> None:
+        self.errors.append({"row": row, "errors": list(messages)})
+
+    def run(self, rows: Iterator[tuple[int, dict | Exception]]) -> dict:
+        batch = []
+
+        # batches commit on their own, so their follow-up jobs are scheduled
+        # even when a later row fails the whole request
+        try:
+            for number, row in rows:
+                if number > IMPORT_MAX_ROWS:
+                    self.error(
+                        number, f"Imports are limited to {IMPORT_MAX_ROWS} rows"
+                    )
+                    break
+
+                if isinstance(row, Exception):
+                    self.error(number, f"row: {row}")
+                    continue
+
+                try:
+                    batch.append((number, ProductImportRowSchema(**row)))
+                except ValidationError as e:
+                    self.error(number, *_errors(e))
+                    continue
+
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    self.save(batch)
+                    batch = []
+
+            if batch:
+                self.save(batch)
+        finally:
+            self.schedule()
+
+        return {
+            "created": len(self.created),
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+        }
+
+    def schedule(self) -> None:
+        """Process the zipped images, then create the products on Stripe"""
+
+        if not self.created:
+            return
+
+        # images first, so Stripe gets the processed image URLs
+        tasks = [
+            process_image.si("products.product", str(id), "image", key)
+            for id, key in self.staged.items()
+        ]
+
+        tasks.append(_create_products.si(list(self.created)))
+
+        transaction.on_commit(chain(*tasks).delay)
+
+    def resolve_categories(self, batch) -> None:
+        """Look up the batch's unseen categories in one query"""
+
+        wanted = {row.category for _, row in batch} - set(self.categories)
+
+        if not wanted:
+            return
+
+        for category in Category.objects.filter(
+            Q(slug__in=wanted) | Q(name__in=wanted)
+        ):
+            self.categories[category.slug] = category
+            self.categories[category.name] = category
+
+        for value in wanted:
+            self.categories.setdefault(value, None)
+
+    def build(self, number: int, row: ProductImportRowSchema) -> Product | None:
+        category = self.categories[row.category]
+
+        if category is None:
+            self.error(number, f"category: Unknown category {row.category!r}")
+            return None
+
+        product = Product(
+            artist=self.artist,
+            category=category,
+            name=row.name,
+            description=row.description,
+            price=row.price,
+            stock=row.stock,
+            is_active=row.is_active,
+        )
+
+        if row.image:
+            try:
+                self.attach_image(product, row.image)
+            except ValueError as e:
+                self.error(number, f"image: {e}")
+                return None
+
+        return product
+
+    def attach_image(self, product: Product, image: str) -> None:
+        if self.images is not None and image in self.images.NameToInfo:
+            info = self.images.getinfo(image)
+
+            if info.file_size > IMPORT_MAX_IMAGE_SIZE:
+                raise ValueError("File is too large")
+
+            content = self.images.read(info)
+
+            try:
+                Image.open(io.BytesIO(content)).verify()
+            except Exception:
+                raise ValueError("Not a valid image")
+
+            digest = content_digest(ContentFile(content))
+
+            if self.use_blob(product, blob_key(Product, "image", digest)):
+                return
+
+            # processed by utils.images once the batch is in
+            self.staged[product.id] = default_storage.save(
+                staging_key(image), ContentFile(content)
+            )
+            return
+
+        if not image.startswith(IMPORT_IMAGE_PREFIXES):
+            prefixes = ", ".join(IMPORT_IMAGE_PREFIXES)
+
+            raise ValueError(f"Not in the zip or under {prefixes}")
+
+        prefix = hashed_prefix(image)
+
+        if prefix and self.use_blob(product, prefix):
+            return
+
+        if not default_storage.exists(image):
+            raise ValueError(f"{image} does not exist")
+
+        product.image.name = image
+
+    def use_blob(self, product: Product, key: str) -> bool:
+        """Point the product at an already processed image, if there is one"""
+
+        blob = ImageBlob.objects.filter(key=key).first()
+
+        if blob is None:
+            return False
+
+        product.image.name = blob.variants["full"]["webp"]
+        product.image_variants = blob.variants
+
+        return True
+
+    def assign_slugs(self, products: list[Product]) -> None:
+        """Unique slugs for the batch, checked against the table in one query"""
+
+        bases = [
+            slugify(product.name)[:SLUG_BASE_LENGTH].strip("-") or "product"
+            for product in products
+        ]
+
+        prefixes = Q()
+
+        for base in set(bases):
+            prefixes |= Q(slug__startswith=base)
+
+        taken = set(Product.objects.filter(prefixes).values_list("slug", flat=True))
+
+        for product, base in zip(products, bases):
+            slug, suffix = base, 1
+
+            while slug in taken:
+                suffix += 1
+                slug = f"{base}-{suffix}"
+
+            product.slug = slug
+            taken.add(slug)
+
+    def save(self, batch: list[tuple[int, ProductImportRowSchema]]) -> None:
+        self.resolve_categories(batch)
+
+        built = [(number, self.build(number, row)) for number, row in batch]
+        built = [(number, product) for number, product in built if product]
+
+        products = [product for _, product in built]
+
+        if not products:
+            return
+
+        # a concurrent import may take a slug between the check and the
+        # insert; recompute once before giving up on the batch
+        for attempt in range(2):
+            self.assign_slugs(products)
+
+            try:
+                with transaction.atomic():
+                    Product.objects.bulk_create(products)
+
+                    retain(*(product.image.name for product in products))
+
+                    products_changed([product.id for product in products])
+            except IntegrityError as e:
+                if attempt:
+                    for number, product in built:
+                        self.error(number, f"row: {e}")
+
+                        if product.id in self.staged:
+                            default_storage.delete(self.staged.pop(product.id))
+                    return
+            else:
+                break
+
+        self.created.extend(str(product.id) for product in products)
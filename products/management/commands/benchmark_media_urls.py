@@ -0,0 +1,74 @@
+import time
+from itertools import chain, islice
+from users.models import User, ArtistProfile
+from products.models import Product
+from utils.storage import MediaStorage
+from storages.backends.s3 import S3Storage
+from django.core.management.base import BaseCommand
+
+# Keys are only signed locally, nothing is sent to S3
+BENCH_STORAGE_OPTIONS = {
+    "access_key": "benchmark",
+    "secret_key": "benchmark",
+    "bucket_name": "benchmark",
+    "region_name": "us-east-1",
+}
+
+
+class Command(BaseCommand):
+    help = "Compare S3Storage.url() with MediaStorage.url() on stored image keys"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--names", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=100)
+
+    def handle(self, *args, **options):
+        names = self.get_names(options["names"])
+        calls = len(names) * options["repeat"]
+
+        for signed in (True, False):
+            for storage_class in (S3Storage, MediaStorage):
+                storage = storage_class(
+                    **BENCH_STORAGE_OPTIONS, querystring_auth=signed
+                )
+
+                # the boto3 client is created on first use
+                storage.url("warmup")
+
+                started = time.perf_counter()
+
+                for _ in range(options["repeat"]):
+                    for name in names:
+                        storage.url(name)
+
+                elapsed = time.perf_counter() - started
+
+                self.stdout.write(
+                    f"{'signed' if signed else 'public':<7}"
+                    f" {storage_class.__name__:<13}"
+                    f" {elapsed / calls * 1e6:9.1f} us/url"
+                )
+
+    def get_names(self, count: int) -> list[str]:
+        """Image keys from the database, padded with made-up ones"""
+
+        names = list(
+            islice(
+                chain(
+                    Product.objects.exclude(image="").values_list("image", flat=True),
+                    User.objects.exclude(profile_picture="").values_list(
+                        "profile_picture", flat=True
+                    ),
+                    ArtistProfile.objects.exclude(banner_image="").values_list(
+                        "banner_image", flat=True
+                    ),
+                ),
+                count,
+            )
+        )
+
+        names = [name for name in names if name]
+
+        names.extend(f"products/{i:064x}/card.webp" for i in range(count - len(names)))
+
+        return names
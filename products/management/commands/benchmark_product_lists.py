@@ -0,0 +1,59 @@
+import time
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from products.models import Product
+from products.rows import product_rows
+from products.api.v1.schema import ProductPageSchema
+from utils.renderers import dumps
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Compare the schema and .values() paths of GET /store/products"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.order_by("-created_at", "-id")[: options["rows"]]
+
+        def schema_path() -> bytes:
+            # what ninja does with the ORM result: validate, dump, render
+            page = ProductPageSchema.model_validate(
+                {"results": list(queryset.select_related("category", "artist__user"))},
+                from_attributes=True,
+            )
+
+            return dumps(page.model_dump())
+
+        def rows_path() -> bytes:
+            return dumps(
+                {
+                    "results": [
+                        product_rows.serialize(row)
+                        for row in product_rows.rows(queryset)
+                    ],
+                    "next_cursor": None,
+                }
+            )
+
+        self.stdout.write(f"rows: {queryset.count()}")
+
+        for label, path in (("schema", schema_path), ("values", rows_path)):
+            path()
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+
+                for _ in range(options["repeat"]):
+                    body = path()
+
+                elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{label:<7} {elapsed / options['repeat'] * 1000:8.1f} ms/page"
+                f" {options['repeat'] / elapsed:8.1f} pages/s"
+                f" {len(queries) / options['repeat']:4.1f} queries/page"
+                f" {len(body)} bytes"
+            )
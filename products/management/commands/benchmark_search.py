@@ -0,0 +1,128 @@
+import time
+import random
+from users.models import User, ArtistProfile
+from django.db import transaction
+from products.models import Category, Product
+from utils.pagination import paginate_keyset
+from products.search import search_products, update_search_vectors
+from django.core.management.base import BaseCommand
+
+BENCH_USERNAME = "search-benchmark"
+
+WORDS = (
+    "glass blue red green amber clear frosted vase bowl figurine bird fish "
+    "horse swan lamp ornament pendant sculpture handmade blown fused stained "
+    "murano crystal miniature large small twisted spiral rainbow opal gold"
+).split()
+
+QUERIES = ("vase", "blue gla", "murrano", "handmade swan figurine", "opal pendent")
+
+
+class Command(BaseCommand):
+    help = "Benchmark /products/filter search against a synthetic catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1_000_000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--cleanup",
+            action="store_true",
+            help="Delete the synthetic catalog and exit",
+        )
+
+    def handle(self, *args, **options):
+        if options["cleanup"]:
+            User.objects.filter(username=BENCH_USERNAME).delete()
+            Category.objects.filter(slug__startswith="bench-").delete()
+
+            return
+
+        artist = self.seed(options["products"], options["batch_size"])
+
+        products = Product.objects.filter(is_active=True)
+
+        for search in QUERIES:
+            legacy = self.time(
+                lambda: paginate_keyset(
+                    products.filter(name__icontains=search).order_by(
+                        "-created_at", "-id"
+                    )
+                ),
+                options["repeat"],
+            )
+
+            ranked = self.time(
+                lambda: paginate_keyset(search_products(products, search)),
+                options["repeat"],
+            )
+
+            self.stdout.write(
+                f"{search!r:<26} icontains {legacy:8.2f} ms"
+                f"   full-text+trigram {ranked:8.2f} ms"
+            )
+
+        self.stdout.write(
+            f"catalog: {Product.objects.filter(artist=artist).count()} synthetic products"
+        )
+
+    def time(self, run, repeat: int) -> float:
+        run()  # warm up
+
+        started = time.perf_counter()
+
+        for _ in range(repeat):
+            run()
+
+        return (time.perf_counter() - started) / repeat * 1000
+
+    def seed(self, total: int, batch_size: int) -> ArtistProfile:
+        user, _ = User.objects.get_or_create(
+            username=BENCH_USERNAME,
+            defaults={"is_artist": True, "is_active": False},
+        )
+
+        artist, _ = ArtistProfile.objects.get_or_create(
+            user=user,
+            defaults={"store_name": "Search Benchmark Glassworks"},
+        )
+
+        existing = Product.objects.filter(artist=artist).count()
+
+        if existing >= total:
+            return artist
+
+        categories = [
+            Category.objects.get_or_create(
+                slug=f"bench-{word}",
+                defaults={"name": f"Bench {word.title()}"},
+            )[0]
+            for word in WORDS[:12]
+        ]
+
+        rng = random.Random(existing)
+
+        for start in range(existing, total, batch_size):
+            with transaction.atomic():
+                Product.objects.bulk_create(
+                    [
+                        Product(
+                            artist=artist,
+                            category=rng.choice(categories),
+                            name=" ".join(rng.sample(WORDS, 3)).title(),
+                            slug=f"bench-{index}",
+                            description=" ".join(rng.choices(WORDS, k=30)),
+                            price=rng.randint(500, 50000) / 100,
+                            stock=rng.randint(0, 20),
+                        )
+                        for index in range(start, min(start + batch_size, total))
+                    ]
+                )
+
+            self.stdout.write(f"seeded {min(start + batch_size, total)}/{total}")
+
+        update_search_vectors(
+            Product.objects.filter(artist=artist, search_vector__isnull=True)
+        )
+
+        return artist
@@ -0,0 +1,128 @@
+import json
+import time
+from decimal import Decimal
+from django.utils import timezone
+from ninja.renderers import JSONRenderer
+from users.models import User, ArtistProfile
+from orders.models import Order, OrderItem
+from products.models import Category, Product, Review
+from utils.renderers import FastJSONRenderer, orjson
+from orders.api.v1.schema import OrderItemSchema, OrderSchema
+from products.api.v1.schema import ProductSchema, ReviewSchema
+from django.core.management.base import BaseCommand
+
+
+def build_payloads(count: int) -> dict:
+    """Schema-dumped payloads shaped like the list endpoints' responses
+
+    Built from unsaved instances, so no database is needed.
+    """
+
+    now = timezone.now()
+
+    user = User(
+        username="benchmark",
+        email="benchmark@example.com",
+        first_name="Bench",
+        last_name="Mark",
+        is_artist=True,
+        bio="Glass artist working with blown and fused glass.",
+        date_joined=now,
+    )
+    artist = ArtistProfile(
+        user=user,
+        store_name="Benchmark Glass",
+        slug="benchmark-glass",
+        about="Handmade glass from a small studio.",
+    )
+    category = Category(name="Vases", slug="vases")
+
+    products = [
+        Product(
+            artist=artist,
+            category=category,
+            name=f"Blown glass vase {i}",
+            slug=f"blown-glass-vase-{i}",
+            description="Hand blown, frosted amber glass with a twisted neck. " * 3,
+            price=Decimal("12.50") + i,
+            stock=i % 7,
+            rating_sum=i % 13 * 4,
+            review_count=i % 13,
+            favorites_count=i % 29,
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(count)
+    ]
+
+    orders = []
+
+    for i in range(count):
+        order = Order(user=user, total_price=Decimal("37.50") + i, created_at=now)
+        items = [
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for product in products[i % count : i % count + 3]
+        ]
+
+        orders.append(
+            {
+                **OrderSchema.from_orm(order).model_dump(),
+                "items": [OrderItemSchema.from_orm(item).model_dump() for item in items],
+            }
+        )
+
+    reviews = [
+        ReviewSchema.from_orm(
+            Review(
+                product=products[i],
+                user=user,
+                rating=i % 5 + 1,
+                comment="Beautiful piece, arrived well packed.",
+                created_at=now,
+            )
+        ).model_dump()
+        for i in range(count)
+    ]
+
+    return {
+        "products": {
+            "results": [ProductSchema.from_orm(product).model_dump() for product in products],
+            "next_cursor": "eyJjcmVhdGVkX2F0IjogIjIwMjUifQ",
+        },
+        "orders": {"orders": orders},
+        "reviews": reviews,
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare the stdlib and orjson API renderers on realistic payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=24)
+        parser.add_argument("--repeat", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write("orjson is not installed, FastJSONRenderer falls back")
+
+        renderers = (("stdlib", JSONRenderer()), ("fast", FastJSONRenderer()))
+
+        for name, payload in build_payloads(options["items"]).items():
+            rendered = {}
+
+            for label, renderer in renderers:
+                started = time.perf_counter()
+
+                for _ in range(options["repeat"]):
+                    body = renderer.render(None, payload, response_status=200)
+
+                elapsed = time.perf_counter() - started
+                rendered[label] = body
+
+                self.stdout.write(
+                    f"{name:<9} {label:<7} {elapsed / options['repeat'] * 1e6:9.1f}"
+                    f" us/response {len(body):7} bytes"
+                )
+
+            if json.loads(rendered["stdlib"]) != json.loads(rendered["fast"]):
+                self.stderr.write(f"{name}: the renderers disagree")
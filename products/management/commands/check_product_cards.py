@@ -0,0 +1,40 @@
+from products.models import Product
+from django.core.management.base import BaseCommand, CommandError
+from products.projections import CARD_BATCH_SIZE, refresh_cards, render_card
+
+
+class Command(BaseCommand):
+    help = "Compare stored product cards with a fresh render"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Re-render missing and stale cards",
+        )
+
+    def handle(self, *args, **options):
+        missing = []
+        stale = []
+
+        products = Product.objects.for_listing().select_related("card")
+
+        for product in products.iterator(chunk_size=CARD_BATCH_SIZE):
+            card = getattr(product, "card", None)
+
+            if card is None:
+                missing.append(product.id)
+            elif card.body != render_card(product):
+                stale.append(product.id)
+
+        self.stdout.write(f"missing: {len(missing)}  stale: {len(stale)}")
+
+        for product_id in stale[:20]:
+            self.stdout.write(f"  stale {product_id}")
+
+        if options["fix"] and (missing or stale):
+            refresh_cards(Product.objects.filter(id__in=missing + stale))
+
+            self.stdout.write(self.style.SUCCESS("Re-rendered cards"))
+        elif missing or stale:
+            raise CommandError("Product cards are out of date")
@@ -0,0 +1,34 @@
+from products.feeds import export_product_feed, pyarrow
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Export the shopping partner product feed to the default storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Export every product instead of those changed since the last run",
+        )
+        parser.add_argument(
+            "--no-compact",
+            action="store_true",
+            help="Only write the partition of changed products",
+        )
+
+    def handle(self, *args, **options):
+        if pyarrow is None:
+            self.stdout.write("pyarrow is not installed, the feed is written as CSV only")
+
+        manifest = export_product_feed(
+            full=options["full"], compact=not options["no_compact"]
+        )
+
+        if manifest is None:
+            raise CommandError("Another feed export is running")
+
+        self.stdout.write(f"changed: {manifest['changed']}  rows: {manifest['rows']}")
+
+        for name in [*manifest["files"].values(), *manifest["partitions"]]:
+            self.stdout.write(f"  {name}")
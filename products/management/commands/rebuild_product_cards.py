@@ -0,0 +1,28 @@
+from products.models import Product, ProductCard
+from products.projections import refresh_cards
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Re-render the pre-serialized product cards"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Only render products that have no card yet",
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+
+        if options["missing"]:
+            products = products.filter(card__isnull=True)
+
+        rendered = refresh_cards(products)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rendered {rendered} cards ({ProductCard.objects.count()} stored)"
+            )
+        )
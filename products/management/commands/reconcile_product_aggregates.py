@@ -0,0 +1,41 @@
+from utils.cache import bump_versions
+from products.models import Product
+from django.core.management.base import BaseCommand
+from products.projections import cards_enabled, refresh_cards
+from products.aggregates import AGGREGATE_FIELDS, drifted, reconcile_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recompute rating and favorite aggregates that drifted from their rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drifted products",
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            products = drifted(Product.objects.all()).values(
+                "id", *AGGREGATE_FIELDS
+            )
+
+            for product in products:
+                self.stdout.write(f"  drifted {product}")
+
+            self.stdout.write(f"drifted: {len(products)}")
+
+            return
+
+        product_ids = reconcile_aggregates(Product.objects.all())
+
+        if product_ids:
+            if cards_enabled():
+                refresh_cards(Product.objects.filter(id__in=product_ids))
+
+            bump_versions("product", *(f"product:{id}" for id in product_ids))
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Reconciled {len(product_ids)} products")
+        )
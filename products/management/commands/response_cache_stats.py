@@ -0,0 +1,22 @@
+from django.conf import settings
+from utils.cache import get_stats
+from django.core.management.base import BaseCommand, CommandError
+
+# Importing the routers registers their cached endpoints
+import products.api.v1.api  # noqa: F401
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counts for the cached catalog endpoints"
+
+    def handle(self, *args, **options):
+        if not settings.RESPONSE_CACHE_STATS:
+            raise CommandError("Hits and misses are counted with RESPONSE_CACHE_STATS")
+
+        for endpoint, stats in get_stats().items():
+            ratio = stats["hit_ratio"]
+
+            self.stdout.write(
+                f"{endpoint}: {stats['hits']} hits, {stats['misses']} misses, "
+                f"hit ratio {'-' if ratio is None else f'{ratio:.1%}'}"
+            )
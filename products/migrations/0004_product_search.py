@@ -0,0 +1,59 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:03
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+from django.contrib.postgres.search import SearchVector
+from django.contrib.postgres.operations import TrigramExtension
+
+
+def build_search_vectors(apps, schema_editor):
+    # products.search.search_vector() as of this migration, kept here so
+    # later changes to it don't change what this migration does
+    Product = apps.get_model("products", "Product")
+    Category = apps.get_model("products", "Category")
+    ArtistProfile = apps.get_model("users", "ArtistProfile")
+
+    category_name = Category.objects.filter(
+        pk=OuterRef("category_id"),
+    ).values("name")[:1]
+
+    store_name = ArtistProfile.objects.filter(
+        pk=OuterRef("artist_id"),
+    ).values("store_name")[:1]
+
+    Product.objects.update(
+        search_vector=(
+            SearchVector("name", weight="A", config="english")
+            + SearchVector(Subquery(category_name), weight="B", config="english")
+            + SearchVector(Subquery(store_name), weight="B", config="english")
+            + SearchVector("description", weight="C", config="english")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_keyset_indexes'),
+        ('users', '0002_user_token_version'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(build_search_vectors, migrations.RunPython.noop),
+    ]
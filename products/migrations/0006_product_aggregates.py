@@ -0,0 +1,57 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:10
+
+from django.db import migrations, models
+from django.db.models import Sum, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _subquery(model, aggregate):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(product=OuterRef("pk"))
+            .order_by()
+            .values("product")
+            .annotate(value=aggregate)
+            .values("value")
+        ),
+        0,
+    )
+
+
+def backfill_aggregates(apps, schema_editor):
+    # products.aggregates.actual_aggregates() as of this migration
+    Product = apps.get_model("products", "Product")
+    Review = apps.get_model("products", "Review")
+    Favorite = apps.get_model("products", "Favorite")
+
+    Product.objects.update(
+        rating_sum=_subquery(Review, Sum("rating")),
+        review_count=_subquery(Review, Count("id")),
+        favorites_count=_subquery(Favorite, Count("id")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_card'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
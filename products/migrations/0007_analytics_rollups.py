@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsDailyBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=64)),
+                ('day', models.DateField()),
+                ('new_products', models.PositiveIntegerField(default=0)),
+                ('new_reviews', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('new_favorites', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Analytics Daily Bucket',
+                'verbose_name_plural': 'Analytics Daily Buckets',
+                'constraints': [models.UniqueConstraint(fields=('scope', 'day'), name='analytics_bucket_scope_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalyticsRollup',
+            fields=[
+                ('scope', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('total_categories', models.PositiveIntegerField(default=0)),
+                ('total_products', models.PositiveIntegerField(default=0)),
+                ('total_reviews', models.PositiveIntegerField(default=0)),
+                ('total_favorites', models.PositiveIntegerField(default=0)),
+                ('category_counts', models.JSONField(default=dict)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Analytics Rollup',
+                'verbose_name_plural': 'Analytics Rollups',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfirmedUpload',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('confirmed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Confirmed Upload',
+                'verbose_name_plural': 'Confirmed Uploads',
+                'indexes': [models.Index(fields=['confirmed_at'], name='confirmedupload_confirmed_idx')],
+            },
+        ),
+    ]
@@ -3,6 +3,18 @@ from django.db import models
 from django.utils.text import slugify
 from users.models import ArtistProfile, User
 from django.core.validators import MinValueValidator
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+
+# Columns behind Product.search_vector, see products.search.SEARCH_FIELDS
+SEARCH_STATE_FIELDS = ("name", "description", "category_id", "artist_id")
+
+# Counters kept by products.aggregates with F() updates
+AGGREGATE_FIELDS = ("rating_sum", "review_count", "favorites_count")
+
+# Written in the database only; saving a loaded Product must not put back
+# the values it was loaded with
+MAINTAINED_FIELDS = (*AGGREGATE_FIELDS, "search_vector")
 
 
 class Category(models.Model):
@@ -29,6 +41,20 @@ class Category(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    """Catalog querysets joined for the schema that renders them"""
+
+    def for_listing(self):
+        """ProductSchema: category, artist and the artist's user"""
+
+        return self.select_related("category", "artist__user")
+
+    def for_store(self):
+        """ProductSchemaTwo: category only, the artist is rendered once"""
+
+        return self.select_related("category")
+
+
 class Product(models.Model):
     """Glass figurines and other artwork for sale"""
 
@@ -75,20 +101,165 @@ class Product(models.Model):
         blank=True,
         null=True,
     )
+    # {"card": {"width": ..., "height": ..., "webp": key, ...}, ...}, written
+    # by utils.images.process_image
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
+    # maintained by products.signals, see products.aggregates
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    favorites_count = models.PositiveIntegerField(default=0, editable=False)
+    # maintained by products.signals, see products.search
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Product"
         verbose_name_plural = "Products"
+        indexes = [
+            # keyset pagination on (created_at, id)
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="product_created_idx",
+            ),
+            models.Index(
+                fields=["artist", "-created_at", "-id"],
+                name="product_artist_created_idx",
+            ),
+            # incremental feed exports (products.feeds)
+            models.Index(
+                fields=["updated_at"],
+                name="product_updated_idx",
+            ),
+            GinIndex(
+                fields=["search_vector"],
+                name="product_search_idx",
+            ),
+            GinIndex(
+                fields=["name"],
+                name="product_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._search_state = instance.get_search_state()
+
+        return instance
+
+    def get_search_state(self) -> tuple:
+        return tuple(self.__dict__.get(field) for field in SEARCH_STATE_FIELDS)
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+
+        if (
+            kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and not self._state.adding
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in MAINTAINED_FIELDS
+            ]
+
+        # read by products.signals.refresh_product to skip rebuilding an
+        # unchanged search vector
+        loaded_state = getattr(self, "_search_state", None)
+        self._search_changed = (
+            loaded_state is None or loaded_state != self.get_search_state()
+        )
+
         super().save(*args, **kwargs)
 
+        self._search_state = self.get_search_state()
+
     def __str__(self):
         return self.name
 
+    @property
+    def average_rating(self) -> float | None:
+        if not self.review_count:
+            return None
+
+        return self.rating_sum / self.review_count
+
+
+class ProductCard(models.Model):
+    """Read model: a product's ProductSchema JSON, rendered ahead of time"""
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="card",
+    )
+    body = models.TextField()
+    rendered_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Product Card"
+        verbose_name_plural = "Product Cards"
+
+    def __str__(self):
+        return f"Card for {self.product_id}"
+
+
+# AnalyticsRollup / AnalyticsDailyBucket scope for marketplace-wide rows;
+# per-store rows use the ArtistProfile id
+MARKETPLACE_SCOPE = "marketplace"
+
+
+class AnalyticsRollup(models.Model):
+    """Read model: analytics totals for one store or the whole marketplace"""
+
+    scope = models.CharField(max_length=64, primary_key=True)
+    total_categories = models.PositiveIntegerField(default=0)
+    total_products = models.PositiveIntegerField(default=0)
+    total_reviews = models.PositiveIntegerField(default=0)
+    total_favorites = models.PositiveIntegerField(default=0)
+    # {category_id: product_count} per store, the full category list for
+    # the marketplace
+    category_counts = models.JSONField(default=dict)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Analytics Rollup"
+        verbose_name_plural = "Analytics Rollups"
+
+    def __str__(self):
+        return f"Rollup for {self.scope}"
+
+
+class AnalyticsDailyBucket(models.Model):
+    """Read model: one day of activity for one store or the marketplace"""
+
+    scope = models.CharField(max_length=64)
+    day = models.DateField()
+    new_products = models.PositiveIntegerField(default=0)
+    new_reviews = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    new_favorites = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Analytics Daily Bucket"
+        verbose_name_plural = "Analytics Daily Buckets"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["scope", "day"],
+                name="analytics_bucket_scope_day",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} on {self.day}"
+
 
 class Review(models.Model):
     """Customer reviews on products"""
@@ -118,6 +289,15 @@ class Review(models.Model):
         verbose_name = "Product Review"
         verbose_name_plural = "Product Reviews"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+
+        # the stored rating, so edits can adjust Product.rating_sum by the delta
+        instance._loaded_rating = instance.__dict__.get("rating")
+
+        return instance
+
     def __str__(self):
         return f"{self.rating}/5 by {self.user.username}"
 
@@ -149,3 +329,57 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f"{self.user.username} favorited {self.product.name}"
+
+
+class ImageBlob(models.Model):
+    """One processed image, stored once under the hash of its source bytes
+
+    key is the storage prefix of the variants, "<upload_to><sha256>/".
+    ref_count is the number of image fields pointing at it, see
+    products.blobs.
+    """
+
+    key = models.CharField(max_length=255, primary_key=True)
+    variants = models.JSONField(default=dict)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # when ref_count last dropped to zero
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Image Blob"
+        verbose_name_plural = "Image Blobs"
+        indexes = [
+            models.Index(
+                fields=["released_at"],
+                name="imageblob_released_idx",
+                condition=models.Q(ref_count=0),
+            ),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class ConfirmedUpload(models.Model):
+    """Staged keys of direct uploads already confirmed, see utils.uploads
+
+    The unique key makes each upload token good for one confirmation
+    across every process; rows outlive their token and are then pruned.
+    """
+
+    key = models.CharField(max_length=255, primary_key=True)
+    confirmed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Confirmed Upload"
+        verbose_name_plural = "Confirmed Uploads"
+        indexes = [
+            models.Index(
+                fields=["confirmed_at"],
+                name="confirmedupload_confirmed_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return self.key
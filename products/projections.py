@@ -0,0 +1,133 @@
+from celery import shared_task
+from utils.cache import bump_versions
+from django.utils import timezone
+from django.http import HttpResponse
+from django.db.models import QuerySet
+from django.core.files.storage import default_storage
+from utils.renderers import dumps
+from products.models import Product, ProductCard
+from products.api.v1.schema import ProductSchema
+
+CARD_BATCH_SIZE = 500
+
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+
+
+def cards_enabled() -> bool:
+    """Cards embed media URLs, which must not be expiring signed URLs"""
+
+    return not getattr(default_storage, "querystring_auth", False)
+
+
+def render_card(product: Product) -> str:
+    """The exact JSON the API renders for ProductSchema"""
+
+    return dumps(ProductSchema.from_orm(product).model_dump()).decode()
+
+
+def refresh_cards(queryset: QuerySet) -> int:
+    """Re-render and upsert the cards of every product in the queryset"""
+
+    rendered = 0
+    batch = []
+
+    for product in queryset.for_listing().iterator(chunk_size=CARD_BATCH_SIZE):
+        batch.append(
+            ProductCard(
+                product=product,
+                body=render_card(product),
+                rendered_at=timezone.now(),
+            )
+        )
+
+        if len(batch) >= CARD_BATCH_SIZE:
+            rendered += _save_cards(batch)
+            batch = []
+
+    if batch:
+        rendered += _save_cards(batch)
+
+    return rendered
+
+
+def _save_cards(cards: list[ProductCard]) -> int:
+    ProductCard.objects.bulk_create(
+        cards,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=["body", "rendered_at"],
+    )
+
+    return len(cards)
+
+
+def get_card_bodies(rows: list[dict]) -> list[str]:
+    """Card bodies for .values("id", "card__body") rows, rendering missing ones"""
+
+    missing = [row["id"] for row in rows if row["card__body"] is None]
+
+    rendered = {}
+
+    if missing:
+        for product in Product.objects.for_listing().filter(id__in=missing):
+            rendered[product.id] = render_card(product)
+
+        _save_cards(
+            [
+                ProductCard(product_id=id, body=body, rendered_at=timezone.now())
+                for id, body in rendered.items()
+            ]
+        )
+
+    bodies = [row["card__body"] or rendered.get(row["id"]) for row in rows]
+
+    # a product deleted between the two queries simply drops out of the page
+    return [body for body in bodies if body is not None]
+
+
+def get_card_body(product_id) -> str:
+    body = (
+        ProductCard.objects.filter(product_id=product_id)
+        .values_list("body", flat=True)
+        .first()
+    )
+
+    if body is None:
+        product = Product.objects.for_listing().get(id=product_id)
+
+        body = render_card(product)
+
+        _save_cards([ProductCard(product=product, body=body, rendered_at=timezone.now())])
+
+    return body
+
+
+def card_response(body: str) -> HttpResponse:
+    return HttpResponse(body, content_type=JSON_CONTENT_TYPE)
+
+
+def card_page_response(rows: list[dict], next_cursor: str | None) -> HttpResponse:
+    """ProductPageSchema JSON assembled from stored card bodies
+
+    Compact, as dumps() renders the page on the row path.
+    """
+
+    results = ",".join(get_card_bodies(rows))
+    cursor = dumps(next_cursor).decode()
+
+    return HttpResponse(
+        f'{{"results":[{results}],"next_cursor":{cursor}}}',
+        content_type=JSON_CONTENT_TYPE,
+    )
+
+
+@shared_task
+def refresh_product_cards(**filters) -> int:
+    """Re-render cards for Product.objects.filter(**filters)"""
+
+    count = refresh_cards(Product.objects.filter(**filters))
+
+    # Responses cached while the worker was catching up embed stale cards
+    bump_versions("product")
+
+    return count
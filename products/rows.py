@@ -0,0 +1,197 @@
+from typing import get_args
+from functools import lru_cache
+from django.db import models
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.core.files.storage import default_storage
+from ninja import ModelSchema
+from utils.images import variant_urls
+from utils.base import parse_field_list
+from utils.renderers import dumps
+from products.projections import JSON_CONTENT_TYPE
+from products.api.v1.schema import ProductSchema, ProductSchemaTwo
+
+
+def _average_rating(row: dict, prefix: str):
+    # as Product.average_rating
+    count = row[f"{prefix}review_count"]
+
+    return row[f"{prefix}rating_sum"] / count if count else None
+
+
+# Schema fields not backed by a column of the same name: the columns they
+# read and how the value is derived from them
+COMPUTED = {
+    "average_rating": (
+        ("rating_sum", "review_count"),
+        _average_rating,
+    ),
+    "image_variants": (
+        ("image_variants",),
+        lambda row, prefix: variant_urls(row[f"{prefix}image_variants"]),
+    ),
+}
+
+
+def _file_url(name: str | None) -> str | None:
+    return default_storage.url(name) if name else None
+
+
+def _relation_schema(field) -> type[ModelSchema] | None:
+    """The nested schema of a relation field, Optional[...] or not"""
+
+    for annotation in (field.annotation, *get_args(field.annotation)):
+        if isinstance(annotation, type) and issubclass(annotation, ModelSchema):
+            return annotation
+
+    return None
+
+
+def _is_relation(field) -> bool:
+    return _relation_schema(field) is not None
+
+
+class RowSerializer:
+    """A ModelSchema's model_dump() built straight from .values() rows
+
+    The columns, joins included, are derived from the schema's fields, so
+    a query selects only what the schema renders and no model or pydantic
+    instance is built per row. products.tests checks the output against
+    the schema's own.
+
+    fields and expand narrow the top level, see sparse_rows(). Schema
+    fields that are not model fields (e.g. search rank) are read from the
+    queryset's annotations when it has them.
+    """
+
+    def __init__(
+        self,
+        schema: type[ModelSchema],
+        fields: frozenset | None = None,
+        expand: frozenset | None = None,
+    ):
+        self.columns: list[str] = []
+        self.annotations: set[str] = set()
+        self._build = self._compile(schema, "", fields, expand)
+
+    def _compile(self, schema: type[ModelSchema], prefix: str, fields, expand):
+        model = schema.Meta.model
+        getters = []
+
+        for name, field in schema.model_fields.items():
+            if fields is not None and name not in fields:
+                if expand is None or name not in expand:
+                    continue
+
+            if name in COMPUTED:
+                columns, compute = COMPUTED[name]
+
+                self.columns.extend(f"{prefix}{column}" for column in columns)
+
+                getters.append(
+                    (name, lambda row, compute=compute: compute(row, prefix))
+                )
+            elif _is_relation(field) and (expand is None or name in expand):
+                nested = _relation_schema(field)
+                build = self._compile(nested, f"{prefix}{name}__", None, None)
+                # usually selected for the nested schema already
+                pk = f"{prefix}{name}__{nested.Meta.model._meta.pk.name}"
+
+                self.columns.append(pk)
+
+                getters.append(
+                    (
+                        name,
+                        lambda row, build=build, pk=pk: None
+                        if row[pk] is None
+                        else build(row),
+                    )
+                )
+            else:
+                # a relation that is not expanded is rendered as its id
+                column = f"{prefix}{name}"
+
+                self.columns.append(column)
+
+                try:
+                    model_field = model._meta.get_field(name)
+                except FieldDoesNotExist:
+                    self.annotations.add(column)
+
+                    getters.append((name, lambda row, column=column: row.get(column)))
+                    continue
+
+                if isinstance(model_field, models.FileField):
+                    getters.append(
+                        (name, lambda row, column=column: _file_url(row[column]))
+                    )
+                else:
+                    getters.append((name, lambda row, column=column: row[column]))
+
+        return lambda row: {name: get(row) for name, get in getters}
+
+    def rows(self, queryset: QuerySet, *extra: str) -> QuerySet:
+        """The queryset as .values() rows carrying every needed column
+
+        The ordering columns are selected too, for paginate_keyset, and any
+        extra columns, e.g. the id rows are looked up by.
+        """
+
+        columns = [
+            column
+            for column in self.columns
+            if column not in self.annotations or column in queryset.query.annotations
+        ]
+
+        ordering = [
+            field.lstrip("-")
+            for field in queryset.query.order_by
+            if isinstance(field, str)
+        ]
+
+        return queryset.values(*dict.fromkeys([*columns, *ordering, *extra]))
+
+    def serialize(self, row: dict) -> dict:
+        return self._build(row)
+
+
+@lru_cache(maxsize=256)
+def _sparse_rows(schema, fields, expand) -> RowSerializer:
+    return RowSerializer(schema, fields, expand)
+
+
+def sparse_rows(
+    schema: type[ModelSchema], fields: str | None, expand: str | None
+) -> RowSerializer:
+    """The serializer for a ?fields= / ?expand= request
+
+    Without fields the whole schema is rendered with its relations nested,
+    as before; expand can't add to that. With fields only the listed fields
+    are, and relations are rendered as their id unless listed in expand
+    (which also includes them).
+    """
+
+    relations = [
+        name for name, field in schema.model_fields.items() if _is_relation(field)
+    ]
+
+    expanded = parse_field_list(expand, relations, "expand") or frozenset()
+
+    if fields is None:
+        return _sparse_rows(schema, None, None)
+
+    return _sparse_rows(
+        schema, parse_field_list(fields, schema.model_fields, "fields"), expanded
+    )
+
+
+def json_response(data) -> HttpResponse:
+    """Already serialized data, rendered without another schema pass"""
+
+    return HttpResponse(dumps(data), content_type=JSON_CONTENT_TYPE)
+
+
+product_rows = _sparse_rows(ProductSchema, None, None)
+
+store_product_rows = _sparse_rows(ProductSchemaTwo, None, None)
@@ -0,0 +1,106 @@
+import re
+from users.models import ArtistProfile
+from products.models import Category
+from django.db.models import DecimalField, F, Q, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Cast
+from django.contrib.postgres.search import (
+    SearchRank,
+    SearchQuery,
+    SearchVector,
+    SearchHeadline,
+    TrigramWordSimilarity,
+)
+
+SEARCH_CONFIG = "english"
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+
+# Rank as paged on: a float4 rank does not survive the JSON cursor, so
+# rows are ordered and compared on it rounded to a fixed decimal
+RANK_KEY_FIELD = DecimalField(max_digits=12, decimal_places=6)
+
+# Fields that feed Product.search_vector
+SEARCH_FIELDS = {"name", "description", "category", "artist"}
+
+
+def search_vector() -> SearchVector:
+    """Weighted document: name (A), category and store name (B), description (C)"""
+
+    category_name = Category.objects.filter(
+        pk=OuterRef("category_id"),
+    ).values("name")[:1]
+
+    store_name = ArtistProfile.objects.filter(
+        pk=OuterRef("artist_id"),
+    ).values("store_name")[:1]
+
+    return (
+        SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(Subquery(category_name), weight="B", config=SEARCH_CONFIG)
+        + SearchVector(Subquery(store_name), weight="B", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset: QuerySet) -> int:
+    """Recompute search_vector for every product in the queryset in one UPDATE"""
+
+    return queryset.update(search_vector=search_vector())
+
+
+def build_search_query(search: str) -> SearchQuery | None:
+    """Prefix query over the words typed so far ("blue gla" -> blue:* & gla:*)"""
+
+    words = re.findall(r"\w+", search)
+
+    if not words:
+        return None
+
+    return SearchQuery(
+        " & ".join(f"{word}:*" for word in words),
+        search_type="raw",
+        config=SEARCH_CONFIG,
+    )
+
+
+def search_products(queryset: QuerySet, search: str) -> QuerySet:
+    """Full-text matches plus trigram matches on name, ranked and highlighted
+
+    Returns the queryset ordered by ("-rank_key", "-id"), rank rounded to
+    RANK_KEY_FIELD, so it can be paged with utils.pagination.paginate_keyset.
+    """
+
+    query = build_search_query(search)
+
+    if query is None:
+        return queryset.none()
+
+    similarity = TrigramWordSimilarity(search, "name")
+
+    return (
+        queryset.filter(
+            Q(search_vector=query) | Q(name__trigram_word_similar=search),
+        )
+        .annotate(
+            rank=SearchRank(F("search_vector"), query) + similarity,
+            name_highlight=SearchHeadline(
+                "name",
+                query,
+                config=SEARCH_CONFIG,
+                start_sel=HIGHLIGHT_START,
+                stop_sel=HIGHLIGHT_STOP,
+                highlight_all=True,
+            ),
+            description_highlight=SearchHeadline(
+                "description",
+                query,
+                config=SEARCH_CONFIG,
+                start_sel=HIGHLIGHT_START,
+                stop_sel=HIGHLIGHT_STOP,
+                max_fragments=2,
+            ),
+        )
+        .annotate(rank_key=Cast("rank", RANK_KEY_FIELD))
+        .order_by("-rank_key", "-id")
+    )
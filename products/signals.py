@@ -0,0 +1,199 @@
+from functools import partial
+from django.db import transaction
+from django.utils import timezone
+from django.dispatch import receiver
+from users.models import User, ArtistProfile
+from products.blobs import release
+from products.aggregates import AGGREGATE_FIELDS, adjust_aggregates
+from products.models import Category, Product, Review, Favorite
+from utils.cache import bump_versions_on_commit
+from django.db.models.signals import post_save, pre_delete, post_delete
+from products.search import SEARCH_FIELDS, update_search_vectors
+from products.projections import cards_enabled, refresh_cards, refresh_product_cards
+
+# UserSchema fields embedded in every product card
+CARD_USER_FIELDS = {
+    "id",
+    "username",
+    "first_name",
+    "last_name",
+    "email",
+    "date_joined",
+    "profile_picture",
+    "is_artist",
+    "bio",
+    "website",
+}
+
+
+def _products_renamed(products) -> None:
+    """A category or store name changed: it is in the products' search
+    vectors and, through updated_at, in the next feed export
+    """
+
+    update_search_vectors(products)
+
+    products.update(updated_at=timezone.now())
+
+
+def _touches(update_fields, fields: set) -> bool:
+    return update_fields is None or bool(fields.intersection(update_fields))
+
+
+def _refresh_cards_later(**filters):
+    """Fan-out card refreshes run on the worker once the change is committed"""
+
+    if cards_enabled():
+        transaction.on_commit(partial(refresh_product_cards.delay, **filters))
+
+
+def products_changed(
+    product_ids: list, update_fields=None, search_changed=None
+) -> None:
+    """What saving a Product triggers, for bulk writes that skip post_save
+
+    search_changed defaults to whether update_fields covers SEARCH_FIELDS.
+    """
+
+    products = Product.objects.filter(pk__in=product_ids)
+
+    if search_changed is None:
+        search_changed = _touches(update_fields, SEARCH_FIELDS)
+
+    if search_changed:
+        update_search_vectors(products)
+
+    if cards_enabled():
+        transaction.on_commit(partial(refresh_cards, products))
+
+    # Registered after the card refresh, so it runs once the card is current
+    bump_versions_on_commit(
+        "product", *(f"product:{product_id}" for product_id in product_ids)
+    )
+
+
+@receiver(post_save, sender=Product)
+def refresh_product(sender, instance, created, update_fields=None, **kwargs):
+    # Full saves (update_fields=None) only rebuild the vector when a
+    # searched column differs from what was loaded
+    search_changed = created or (
+        _touches(update_fields, SEARCH_FIELDS)
+        and getattr(instance, "_search_changed", True)
+    )
+
+    products_changed([instance.pk], update_fields, search_changed)
+
+
+@receiver(post_delete, sender=Product)
+def forget_product(sender, instance, **kwargs):
+    release(instance.image.name)
+
+    bump_versions_on_commit("product", f"product:{instance.pk}")
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_products(sender, instance, created, update_fields=None, **kwargs):
+    bump_versions_on_commit("category")
+
+    if created:
+        return
+
+    if _touches(update_fields, {"name"}):
+        _products_renamed(Product.objects.filter(category=instance))
+
+    _refresh_cards_later(category_id=str(instance.pk))
+
+
+@receiver(pre_delete, sender=Category)
+def refresh_uncategorized_products(sender, instance, **kwargs):
+    bump_versions_on_commit("category")
+
+    # Products keep their rows (SET_NULL) but lose the embedded category,
+    # and their feed rows its name
+    product_ids = [str(id) for id in instance.products.values_list("id", flat=True)]
+
+    instance.products.update(updated_at=timezone.now())
+
+    if product_ids:
+        _refresh_cards_later(id__in=product_ids)
+
+
+@receiver(post_save, sender=ArtistProfile)
+def refresh_store_products(sender, instance, created, update_fields=None, **kwargs):
+    bump_versions_on_commit("artist")
+
+    if created:
+        return
+
+    if _touches(update_fields, {"store_name"}):
+        _products_renamed(Product.objects.filter(artist=instance))
+
+    _refresh_cards_later(artist_id=str(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def refresh_artist_products(sender, instance, created, update_fields=None, **kwargs):
+    if created or not instance.is_artist:
+        return
+
+    if _touches(update_fields, CARD_USER_FIELDS):
+        bump_versions_on_commit("artist")
+
+        _refresh_cards_later(artist__user_id=str(instance.pk))
+
+
+@receiver(post_delete, sender=ArtistProfile)
+def forget_store(sender, instance, **kwargs):
+    release(instance.banner_image.name)
+
+    bump_versions_on_commit("artist")
+
+
+@receiver(post_delete, sender=User)
+def forget_user(sender, instance, **kwargs):
+    release(instance.profile_picture.name)
+
+
+@receiver(post_save, sender=Review)
+def count_review(sender, instance, created, **kwargs):
+    if created:
+        adjust_aggregates(
+            instance.product_id, rating_sum=instance.rating, review_count=1
+        )
+    else:
+        loaded = getattr(instance, "_loaded_rating", None)
+
+        if loaded is None or loaded == instance.rating:
+            return
+
+        adjust_aggregates(instance.product_id, rating_sum=instance.rating - loaded)
+
+    instance._loaded_rating = instance.rating
+
+    products_changed([instance.product_id], AGGREGATE_FIELDS)
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review(sender, instance, **kwargs):
+    adjust_aggregates(
+        instance.product_id,
+        rating_sum=-getattr(instance, "_loaded_rating", instance.rating),
+        review_count=-1,
+    )
+
+    products_changed([instance.product_id], AGGREGATE_FIELDS)
+
+
+@receiver(post_save, sender=Favorite)
+def count_favorite(sender, instance, created, **kwargs):
+    if created:
+        adjust_aggregates(instance.product_id, favorites_count=1)
+
+        products_changed([instance.product_id], AGGREGATE_FIELDS)
+
+
+@receiver(post_delete, sender=Favorite)
+def uncount_favorite(sender, instance, **kwargs):
+    adjust_aggregates(instance.product_id, favorites_count=-1)
+
+    products_changed([instance.product_id], AGGREGATE_FIELDS)
@@ -1,3 +1,706 @@
-from django.test import TestCase
+import io
+import uuid
+import tempfile
+import requests
+from unittest import mock, skipUnless
+from PIL import Image
+from ninja.errors import HttpError
+from django.db import connection
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from users.models import User, ArtistProfile
+from utils.base import login_jwt
+from utils.renderers import dumps
+from utils.pagination import encode_cursor
+from products.models import Category, Product, Review, Favorite
+from products.bulk import bulk_update_products
+from products.rows import product_rows, sparse_rows, store_product_rows
+from products.api.v1.schema import (
+    PRODUCT_BATCH_MAX_IDS,
+    ProductBulkUpdateItemSchema,
+    ProductSchema,
+    ProductSchemaTwo,
+)
+from utils.uploads import UPLOAD_SALT, confirm_upload, create_presigned_upload
 
-# Create your tests here.
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:  # dev dependency, the upload tests are skipped
+    mock_aws = None
+
+# Per-process cache: cached_response and conditional_response step aside,
+# so every request below reaches the database
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# A moto bucket behind utils.storage.MediaStorage
+S3_STORAGES = {
+    "default": {
+        "BACKEND": "utils.storage.MediaStorage",
+        "OPTIONS": {
+            "bucket_name": "media",
+            "region_name": "us-east-1",
+            "access_key": "testing",
+            "secret_key": "testing",
+            "endpoint_url": None,
+        },
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+    },
+}
+
+# Plain media URLs, so both serializations of a file name compare equal
+LOCAL_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+    },
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ProductListQueryTests(TestCase):
+    """List endpoints run a fixed number of queries, whatever the page holds"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.artist = User.objects.create(username="artist", is_artist=True)
+        cls.buyer = User.objects.create(username="buyer")
+        cls.store = ArtistProfile.objects.create(
+            user=cls.artist, store_name="Glass Co", about="Hand blown glass"
+        )
+        cls.category = Category.objects.create(name="Vases")
+
+    def add_products(self, count: int) -> None:
+        # run the on-commit card refreshes, as a committed save would
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                product = Product.objects.create(
+                    artist=self.store,
+                    category=self.category,
+                    name=f"Vase {Product.objects.count()}",
+                    description="Hand blown glass",
+                    price="12.50",
+                )
+
+                Favorite.objects.create(user=self.buyer, product=product)
+
+    def get(self, url: str, user: User | None = None):
+        headers = {"Authorization": f"Bearer {login_jwt(user)}"} if user else {}
+
+        return self.client.get(url, query_params={"page_size": 50}, headers=headers)
+
+    def assertConstantQueries(self, url: str, user: User | None = None, key="results"):
+        self.add_products(2)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(url, user)
+
+        self.assertEqual(len(response.json()[key]), 2)
+
+        self.add_products(20)
+
+        with self.assertNumQueries(len(queries)):
+            response = self.get(url, user)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()[key]), 22)
+
+    def test_products(self):
+        self.assertConstantQueries("/api/v1/store/products")
+
+    def test_store_products(self):
+        self.assertConstantQueries(
+            f"/api/v1/store/products/store/{self.store.slug}", key="products"
+        )
+
+    def test_seller_products(self):
+        self.assertConstantQueries("/api/v1/store/products/seller", self.artist)
+
+    def test_favorites(self):
+        self.assertConstantQueries("/api/v1/store/favorites", self.buyer)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ProductPaginationTests(TestCase):
+    """Keyset pages of /products, and the cursors and page sizes they take"""
+
+    url = "/api/v1/store/products"
+
+    @classmethod
+    def setUpTestData(cls):
+        artist = User.objects.create(username="artist", is_artist=True)
+        store = ArtistProfile.objects.create(
+            user=artist, store_name="Glass Co", about="Hand blown glass"
+        )
+
+        cls.ids = {
+            str(
+                Product.objects.create(
+                    artist=store,
+                    name=f"Vase {i}",
+                    description="Hand blown glass",
+                    price="12.50",
+                ).id
+            )
+            for i in range(5)
+        }
+
+    def get(self, **params):
+        return self.client.get(self.url, query_params={"fields": "id", **params})
+
+    def test_garbage_cursor(self):
+        for cursor in ("!!!", "bm90IGpzb24", encode_cursor({"a": 1})):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.get(cursor=cursor).status_code, 400)
+
+    def test_cursor_values_of_the_wrong_type(self):
+        for values in (["yesterday", "1"], [None, None], ["2024-01-01T00:00:00"]):
+            with self.subTest(values=values):
+                response = self.get(cursor=encode_cursor(values))
+
+                self.assertEqual(response.status_code, 400)
+
+    @override_settings(KEYSET_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        response = self.get(page_size=1000)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 3)
+        self.assertIsNotNone(response.json()["next_cursor"])
+
+    def test_tied_created_at(self):
+        Product.objects.update(created_at=Product.objects.first().created_at)
+
+        seen, cursor = [], None
+
+        while True:
+            params = {"page_size": 2}
+
+            if cursor:
+                params["cursor"] = cursor
+
+            response = self.get(**params)
+
+            self.assertEqual(response.status_code, 200)
+
+            seen.extend(result["id"] for result in response.json()["results"])
+            cursor = response.json()["next_cursor"]
+
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), len(self.ids))
+        self.assertEqual(set(seen), self.ids)
+
+
+class ConditionalResponseTests(TestCase):
+    """ETags and 304s from the response cache versions, with a shared cache"""
+
+    url = "/api/v1/store/products"
+
+    @classmethod
+    def setUpTestData(cls):
+        artist = User.objects.create(username="artist", is_artist=True)
+        cls.store = ArtistProfile.objects.create(
+            user=artist, store_name="Glass Co", about="Hand blown glass"
+        )
+
+    def setUp(self):
+        location = self.enterContext(tempfile.TemporaryDirectory())
+        caches = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+            }
+        }
+
+        self.enterContext(override_settings(CACHES=caches))
+
+        self.add_product()
+
+    def add_product(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(
+                artist=self.store,
+                name=f"Vase {Product.objects.count()}",
+                description="Hand blown glass",
+                image="products/vase.png",
+                price="12.50",
+            )
+
+    def revalidate(self, etag: str):
+        return self.client.get(
+            self.url,
+            headers={
+                "If-None-Match": etag,
+                "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT",
+            },
+        )
+
+    @override_settings(STORAGES=LOCAL_STORAGES)
+    def test_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.revalidate(etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    @override_settings(STORAGES=LOCAL_STORAGES)
+    def test_modified_after_bump(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        self.add_product()
+
+        response = self.revalidate(etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    @override_settings(STORAGES=S3_STORAGES, AWS_QUERYSTRING_AUTH=True)
+    def test_signed_urls_never_revalidate(self):
+        response = self.client.get(self.url)
+
+        self.assertNotIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+        self.assertIn("Signature=", response.json()["results"][0]["image"])
+
+        # whatever the client sends, the signed URLs are rendered afresh
+        self.assertEqual(self.revalidate('"any"').status_code, 200)
+        self.assertEqual(self.revalidate("*").status_code, 200)
+
+
+@skipUnless(connection.vendor == "postgresql", "search needs PostgreSQL")
+@override_settings(CACHES=LOCAL_CACHES, STORAGES=LOCAL_STORAGES)
+class SearchPagingTests(TestCase):
+    """Search results page by rank without skipping or repeating a row"""
+
+    def setUp(self):
+        artist = User.objects.create(username="artist", is_artist=True)
+        store = ArtistProfile.objects.create(
+            user=artist, store_name="Glass Co", about="Hand blown glass"
+        )
+
+        # identical documents tie on rank, the others differ only slightly
+        names = ["Blue vase"] * 5 + ["Blue vase, tall", "Blue vase, small"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ids = {
+                str(
+                    Product.objects.create(
+                        artist=store,
+                        name=name,
+                        description=f"Hand blown blue glass vase no. {i}",
+                        price="12.50",
+                    ).id
+                )
+                for i, name in enumerate(names)
+            }
+
+    def test_every_page(self):
+        seen, cursor = [], None
+
+        while True:
+            params = {"search": "blue vase", "page_size": 2}
+
+            if cursor:
+                params["cursor"] = cursor
+
+            response = self.client.get("/api/v1/store/products/filter", params)
+
+            self.assertEqual(response.status_code, 200)
+
+            seen.extend(result["id"] for result in response.json()["results"])
+            cursor = response.json()["next_cursor"]
+
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), len(self.ids))
+        self.assertEqual(set(seen), self.ids)
+
+
+@override_settings(STORAGES=LOCAL_STORAGES)
+class ProductRowsTests(TestCase):
+    """The .values() row serializers render exactly what their schemas do"""
+
+    @classmethod
+    def setUpTestData(cls):
+        artist = User.objects.create(username="artist", is_artist=True)
+        buyer = User.objects.create(username="buyer")
+        store = ArtistProfile.objects.create(
+            user=artist, store_name="Glass Co", about="Hand blown glass"
+        )
+        category = Category.objects.create(name="Vases")
+
+        def product(name, **fields):
+            return Product.objects.create(
+                artist=store,
+                name=name,
+                description="Hand blown glass",
+                price="12.50",
+                **fields,
+            )
+
+        reviewed = product(
+            "Reviewed",
+            category=category,
+            image="products/reviewed.png",
+            image_variants={
+                "card": {"width": 400, "height": 300, "webp": "products/card.webp"}
+            },
+        )
+
+        Review.objects.create(product=reviewed, user=buyer, rating=4)
+        Review.objects.create(product=reviewed, user=artist, rating=5)
+
+        product("Uncategorized", image="products/uncategorized.png")
+        product("No image", category=category)
+        product("Bare")
+
+    def assertRowsMatch(self, serializer, schema):
+        products = Product.objects.for_listing().order_by("name")
+        rows = {row["id"]: row for row in serializer.rows(Product.objects.all())}
+
+        self.assertEqual(len(rows), 4)
+
+        for product in products:
+            with self.subTest(product=product.name):
+                self.assertEqual(
+                    dumps(serializer.serialize(rows[product.id])),
+                    dumps(schema.from_orm(product).model_dump()),
+                )
+
+    def test_product_rows(self):
+        self.assertRowsMatch(product_rows, ProductSchema)
+
+    def test_store_product_rows(self):
+        self.assertRowsMatch(store_product_rows, ProductSchemaTwo)
+
+    @override_settings(CACHES=LOCAL_CACHES)
+    def test_card_page_matches_row_page(self):
+        url = "/api/v1/store/products"
+
+        for page_size in (2, 50):
+            with self.subTest(page_size=page_size):
+                params = {"page_size": page_size}
+
+                cards = self.client.get(url, query_params=params)
+
+                with mock.patch(
+                    "products.api.v1.api.cards_enabled", return_value=False
+                ):
+                    rows = self.client.get(url, query_params=params)
+
+                self.assertEqual(cards.status_code, 200)
+                self.assertEqual(cards.content, rows.content)
+
+    def test_expand_keeps_default_nesting(self):
+        product = Product.objects.get(name="Reviewed")
+        serializer = sparse_rows(ProductSchema, None, "artist")
+
+        row = serializer.rows(Product.objects.filter(id=product.id)).get()
+
+        self.assertEqual(serializer.serialize(row)["category"]["name"], "Vases")
+        self.assertEqual(
+            dumps(serializer.serialize(row)),
+            dumps(ProductSchema.from_orm(product).model_dump()),
+        )
+
+
+@override_settings(CACHES=LOCAL_CACHES, STORAGES=LOCAL_STORAGES)
+class ProductBatchTests(TestCase):
+    """/products/batch returns one result per requested id, in order"""
+
+    url = "/api/v1/store/products/batch"
+
+    @classmethod
+    def setUpTestData(cls):
+        artist = User.objects.create(username="artist", is_artist=True)
+        store = ArtistProfile.objects.create(
+            user=artist, store_name="Glass Co", about="Hand blown glass"
+        )
+
+        cls.first, cls.second = (
+            Product.objects.create(
+                artist=store,
+                name=name,
+                description="Hand blown glass",
+                price="12.50",
+            )
+            for name in ("First", "Second")
+        )
+
+    def batch(self, *ids, **params):
+        return self.client.get(
+            self.url, query_params={"ids": ",".join(map(str, ids)), **params}
+        )
+
+    def test_request_order_and_duplicates(self):
+        response = self.batch(self.second.id, self.first.id, self.second.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result["name"] for result in response.json()["results"]],
+            ["Second", "First", "Second"],
+        )
+        self.assertEqual(response.json()["missing"], [])
+
+    def test_missing(self):
+        unknown = uuid.uuid4()
+
+        response = self.batch(unknown, self.first.id, unknown)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0], None)
+        self.assertEqual(response.json()["results"][1]["name"], "First")
+        self.assertEqual(response.json()["missing"], [str(unknown)])
+
+    def test_fields_without_id(self):
+        response = self.batch(self.second.id, self.first.id, fields="name")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"], [{"name": "Second"}, {"name": "First"}]
+        )
+
+    def test_too_many_ids(self):
+        ids = [uuid.uuid4() for _ in range(PRODUCT_BATCH_MAX_IDS + 1)]
+
+        self.assertEqual(self.batch(*ids).status_code, 400)
+
+    def test_malformed_id(self):
+        self.assertEqual(self.batch(self.first.id, "not-a-uuid").status_code, 400)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ProductAggregateTests(TestCase):
+    """Reviews and favorites keep the denormalized counters on Product"""
+
+    @classmethod
+    def setUpTestData(cls):
+        artist = User.objects.create(username="artist", is_artist=True)
+        cls.buyer = User.objects.create(username="buyer")
+        cls.other = User.objects.create(username="other")
+        store = ArtistProfile.objects.create(
+            user=artist, store_name="Glass Co", about="Hand blown glass"
+        )
+
+        cls.product = Product.objects.create(
+            artist=store,
+            name="Vase",
+            description="Hand blown glass",
+            price="12.50",
+        )
+
+    def assertAggregates(self, **expected):
+        product = Product.objects.get(id=self.product.id)
+
+        self.assertEqual(
+            {field: getattr(product, field) for field in expected}, expected
+        )
+
+    def test_reviews(self):
+        Review.objects.create(product=self.product, user=self.buyer, rating=4)
+        Review.objects.create(product=self.product, user=self.other, rating=5)
+
+        self.assertAggregates(rating_sum=9, review_count=2)
+
+        review = Review.objects.get(user=self.buyer)
+        review.rating = 2
+        review.save()
+
+        self.assertAggregates(rating_sum=7, review_count=2)
+
+        Review.objects.get(user=self.other).delete()
+
+        self.assertAggregates(rating_sum=2, review_count=1)
+
+        review.delete()
+
+        self.assertAggregates(rating_sum=0, review_count=0)
+
+    def test_favorites(self):
+        Favorite.objects.create(product=self.product, user=self.buyer)
+        favorite = Favorite.objects.create(product=self.product, user=self.other)
+
+        self.assertAggregates(favorites_count=2)
+
+        favorite.delete()
+
+        self.assertAggregates(favorites_count=1)
+
+    def test_stale_product_save_keeps_counters(self):
+        stale = Product.objects.get(id=self.product.id)
+
+        Review.objects.create(product=self.product, user=self.buyer, rating=4)
+        Favorite.objects.create(product=self.product, user=self.buyer)
+
+        stale.name = "Tall vase"
+        stale.save()
+
+        self.assertAggregates(
+            name="Tall vase", rating_sum=4, review_count=1, favorites_count=1
+        )
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class BulkUpdateTests(TestCase):
+    """bulk_update_products applies every item or none, and syncs what changed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        artist = User.objects.create(username="artist", is_artist=True)
+        cls.store = ArtistProfile.objects.create(
+            user=artist, store_name="Glass Co", about="Hand blown glass"
+        )
+
+        cls.first, cls.second, cls.third = (
+            Product.objects.create(
+                artist=cls.store,
+                name=name,
+                description="Hand blown glass",
+                price="12.50",
+                stock=1,
+            )
+            for name in ("First", "Second", "Third")
+        )
+
+    def update(self, *items: dict) -> dict:
+        return bulk_update_products(
+            self.store, [ProductBulkUpdateItemSchema(**item) for item in items]
+        )
+
+    def test_missing_product_rolls_back(self):
+        unknown = str(uuid.uuid4())
+
+        with self.assertRaisesMessage(HttpError, unknown) as error:
+            self.update(
+                {"id": str(self.first.id), "stock": 5},
+                {"id": unknown, "stock": 5},
+            )
+
+        self.assertEqual(error.exception.status_code, 404)
+
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.stock, 1)
+
+    @mock.patch("utils.stripe._update_products.delay")
+    def test_only_changed_prices_are_repriced(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.update(
+                {"id": str(self.first.id), "price": "15.00"},
+                # the same price: not a change
+                {"id": str(self.second.id), "name": "Renamed", "price": "12.50"},
+                # not mirrored on Stripe
+                {"id": str(self.third.id), "stock": 9},
+            )
+
+        self.assertEqual(result, {"updated": 3, "synced": 2})
+
+        delay.assert_called_once_with(
+            [str(self.first.id), str(self.second.id)], [str(self.first.id)]
+        )
+
+    @mock.patch("utils.stripe._update_products.delay")
+    def test_sync_waits_for_commit(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.update({"id": str(self.first.id), "price": "15.00"})
+
+            delay.assert_not_called()
+
+        delay.assert_called_once_with([str(self.first.id)], [str(self.first.id)])
+
+    @mock.patch("utils.stripe._update_products.delay")
+    def test_unchanged_items_sync_nothing(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.update({"id": str(self.first.id), "stock": 1})
+
+        self.assertEqual(result, {"updated": 0, "synced": 0})
+        delay.assert_not_called()
+
+
+@skipUnless(mock_aws, "moto is not installed")
+@override_settings(STORAGES=S3_STORAGES)
+class DirectUploadTests(TestCase):
+    """Presigned POST to S3, then confirm_upload() of the staged key"""
+
+    def setUp(self):
+        mock = mock_aws()
+        mock.start()
+        self.addCleanup(mock.stop)
+
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="media")
+
+        self.user = User.objects.create(username="artist", is_artist=True)
+
+    def upload(self, content: bytes, content_type="image/png") -> str:
+        """Send the content the way a client does; returns the upload token"""
+
+        upload = create_presigned_upload(self.user.id, "image", content_type)
+
+        response = requests.post(
+            upload["url"],
+            data=upload["fields"],
+            files={"file": ("upload", content)},
+        )
+
+        self.assertLess(response.status_code, 300)
+
+        return upload["token"]
+
+    def png(self) -> bytes:
+        file = io.BytesIO()
+        Image.new("RGB", (4, 4), "blue").save(file, "PNG")
+
+        return file.getvalue()
+
+    def assertRejected(self, message: str, *args):
+        with self.assertRaisesMessage(HttpError, message):
+            confirm_upload(*args)
+
+    def test_confirm(self):
+        key = confirm_upload(self.upload(self.png()), self.user.id, "image")
+
+        self.assertTrue(default_storage.exists(key))
+
+    def test_replayed_token(self):
+        token = self.upload(self.png())
+
+        confirm_upload(token, self.user.id, "image")
+
+        self.assertRejected("already been confirmed", token, self.user.id, "image")
+
+    def test_token_of_another_user_or_target(self):
+        token = self.upload(self.png())
+        other = User.objects.create(username="other")
+
+        self.assertRejected("Invalid or expired", token, other.id, "image")
+        self.assertRejected("Invalid or expired", token, self.user.id, "banner_image")
+
+    def test_key_never_uploaded(self):
+        upload = create_presigned_upload(self.user.id, "image", "image/png")
+
+        self.assertRejected("Upload not found", upload["token"], self.user.id, "image")
+
+    def test_not_an_image(self):
+        token = self.upload(b"GIF89a, not a PNG")
+
+        self.assertRejected("not a valid image", token, self.user.id, "image")
+
+    def test_oversized(self):
+        token = self.upload(self.png())
+
+        # larger than allowed by the time it is confirmed
+        with mock.patch("utils.uploads.MAX_UPLOAD_SIZE", 8):
+            self.assertRejected("not a valid image", token, self.user.id, "image")
+
+        # and deleted from staging
+        key = signing.loads(token, salt=UPLOAD_SALT)["key"]
+
+        self.assertFalse(default_storage.exists(key))
@@ -3,6 +3,8 @@ from django.conf import settings
 from django.db import transaction
 from ninja.errors import HttpError
 from ninja.files import UploadedFile
+from utils.images import process_staged, process_upload
+from utils.uploads import confirm_upload, create_presigned_upload
 from utils.notifications import send_email
 from django.contrib.auth import authenticate
 from users.models import User, ArtistProfile
@@ -14,6 +16,8 @@ from utils.base import (
     require_role,
     require_active,
     password_reset_jwt,
+    get_artist_profile,
+    get_principal,
     get_authenticated_user,
 )
 from .schema import (
@@ -26,6 +30,9 @@ from .schema import (
     UserPasswordResetSchema,
     ArtistProfileInputSchema1,
     ArtistProfileInputSchema2,
+    PresignedUploadSchema,
+    ImageUploadRequestSchema,
+    ImageUploadConfirmSchema,
 )
 
 router = Router()
@@ -151,7 +158,31 @@ def create_account(request, data: UserInputSchema1, verification_token):
 def update_profile_pic(request, file: UploadedFile = File(...)):  # type: ignore
     user = get_authenticated_user(request)
 
-    user.profile_picture.save(file.name, file, save=True)
+    process_upload(user, "profile_picture", file)
+
+    return {"message": "Profile picture updated successfully"}
+
+
+@router.post("account/profile-pic/upload", auth=bearer, response=PresignedUploadSchema)
+@require_active
+def upload_profile_pic(request, data: ImageUploadRequestSchema):
+    """Step 1 of a direct upload: POST the file to the returned url"""
+
+    return create_presigned_upload(
+        get_principal(request).id, "profile_picture", data.content_type
+    )
+
+
+@router.post("account/profile-pic/confirm", auth=bearer, response=dict)
+@require_active
+def confirm_profile_pic(request, data: ImageUploadConfirmSchema):
+    """Step 2 of a direct upload: attach the uploaded file"""
+
+    user = get_authenticated_user(request)
+
+    process_staged(
+        user, "profile_picture", confirm_upload(data.token, user.id, "profile_picture")
+    )
 
     return {"message": "Profile picture updated successfully"}
 
@@ -161,8 +192,8 @@ def update_profile_pic(request, file: UploadedFile = File(...)):  # type: ignore
 def view_my_profile(request):
     user = get_authenticated_user(request)
 
-    if ArtistProfile.objects.filter(user=user).exists():
-        return ArtistProfile.objects.get(user=user).decrypt_credentials()
+    if hasattr(user, "artist_profile"):
+        return user.artist_profile.decrypt_credentials()
     else:
         return user
 
@@ -214,9 +245,7 @@ def create_artist_profile(request, data: ArtistProfileInputSchema1):
 @require_active
 @require_role(is_artist=True)
 def update_artist_profile(request, data: ArtistProfileInputSchema2):
-    user = get_authenticated_user(request)
-
-    artist_profile = ArtistProfile.objects.get(user=user)
+    artist_profile = get_artist_profile(request)
 
     if data.store_name:
         artist_profile.store_name = data.store_name
@@ -235,11 +264,35 @@ def update_artist_profile(request, data: ArtistProfileInputSchema2):
 @router.post("profile/banner-pic", auth=bearer, response=dict)
 @require_active
 def update_banner_pic(request, file: UploadedFile = File(...)):  # type: ignore
-    user = get_authenticated_user(request)
+    artist_profile = get_artist_profile(request)
+
+    process_upload(artist_profile, "banner_image", file)
+
+    return {"message": "Banner picture updated successfully"}
+
+
+@router.post("profile/banner-pic/upload", auth=bearer, response=PresignedUploadSchema)
+@require_active
+@require_role(is_artist=True)
+def upload_banner_pic(request, data: ImageUploadRequestSchema):
+    """Step 1 of a direct upload: POST the file to the returned url"""
+
+    return create_presigned_upload(
+        get_principal(request).id, "banner_image", data.content_type
+    )
+
+
+@router.post("profile/banner-pic/confirm", auth=bearer, response=dict)
+@require_active
+@require_role(is_artist=True)
+def confirm_banner_pic(request, data: ImageUploadConfirmSchema):
+    """Step 2 of a direct upload: attach the uploaded file"""
+
+    artist_profile = get_artist_profile(request)
 
-    artist_profile = ArtistProfile.objects.get(user=user)
+    key = confirm_upload(data.token, get_principal(request).id, "banner_image")
 
-    artist_profile.banner_image.save(file.name, file, save=True)
+    process_staged(artist_profile, "banner_image", key)
 
     return {"message": "Banner picture updated successfully"}
 
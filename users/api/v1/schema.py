@@ -16,6 +16,7 @@ class UserSchema(ModelSchema):
             "last_login",
             "is_superuser",
             "user_permissions",
+            "token_version",
         ]
 
 
@@ -77,3 +78,18 @@ class ArtistProfileInputSchema2(Schema):
     store_name: Optional[str] = None
     about: Optional[str] = None
     stripe_secret_key: Optional[str] = None
+
+
+class ImageUploadRequestSchema(Schema):
+    content_type: str
+
+
+class PresignedUploadSchema(Schema):
+    url: str
+    fields: dict
+    token: str
+    expires_in: int
+
+
+class ImageUploadConfirmSchema(Schema):
+    token: str
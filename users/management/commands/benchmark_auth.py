@@ -0,0 +1,53 @@
+import time
+from users.models import User
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.core.management.base import BaseCommand
+from utils.tokens import verified_tokens
+from utils.base import AuthBearer, login_jwt, check_if_is_active, check_user_role
+
+
+class Command(BaseCommand):
+    help = "Compare database-backed and stateless JWT authentication"
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--iterations", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+
+        user = User.objects.get(username=options["username"])
+
+        token = login_jwt(user)
+
+        bearer = AuthBearer()
+
+        request = RequestFactory().get("/")
+
+        for label, stateless in (("database", False), ("stateless", True)):
+            queries = []
+
+            def count_queries(execute, sql, params, many, context):
+                queries.append(sql)
+
+                return execute(sql, params, many, context)
+
+            with override_settings(AUTH_STATELESS_JWT=stateless):
+                with connection.execute_wrapper(count_queries):
+                    started = time.perf_counter()
+
+                    for _ in range(iterations):
+                        request.auth = bearer.authenticate(request, token)
+
+                        check_if_is_active(request)
+                        check_user_role(request, user.is_artist)
+
+                    elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{label:<10} {elapsed / iterations * 1e6:9.1f} us/request"
+                f" {len(queries) / iterations:6.2f} queries/request"
+            )
+
+        self.stdout.write(f"verified token cache: {verified_tokens.stats()}")
@@ -1,6 +1,9 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.db import transaction
+from django.core.cache import cache
+from utils.tokens import verified_tokens
 from django.utils.text import slugify
 from django_countries.fields import CountryField
 from django.core.exceptions import ValidationError
@@ -9,6 +12,11 @@ from cryptography.fernet import Fernet, InvalidToken
 
 cipher = Fernet(settings.FERNET_KEY)
 
+TOKEN_STATE_CACHE_KEY = "auth:token_state:{}"
+
+# Changing any of these revokes every token issued to the user.
+AUTH_STATE_FIELDS = ("password", "is_active", "is_artist", "is_staff")
+
 
 class User(AbstractUser):
     """Custom user model for artists and buyers"""
@@ -27,6 +35,43 @@ class User(AbstractUser):
     bio = models.TextField(blank=True, null=True)
     country = CountryField(blank=True, null=True)
     website = models.URLField(blank=True, null=True)
+    token_version = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._auth_state = instance.get_auth_state()
+
+        return instance
+
+    def get_auth_state(self) -> tuple:
+        return tuple(self.__dict__.get(field) for field in AUTH_STATE_FIELDS)
+
+    def revoke_tokens(self):
+        # The next request reloads the state; workers without a shared cache
+        # notice within AUTH_TOKEN_STATE_TTL
+        cache.delete(TOKEN_STATE_CACHE_KEY.format(self.id))
+
+        verified_tokens.evict_user(self.id)
+
+    def save(self, *args, **kwargs):
+        loaded_state = getattr(self, "_auth_state", None)
+        revoke_tokens = (
+            loaded_state is not None and loaded_state != self.get_auth_state()
+        )
+
+        if revoke_tokens:
+            self.token_version += 1
+
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "token_version"}
+
+        super().save(*args, **kwargs)
+
+        self._auth_state = self.get_auth_state()
+
+        if revoke_tokens:
+            transaction.on_commit(self.revoke_tokens)
 
 
 class ArtistProfile(models.Model):
@@ -1,3 +1,79 @@
-from django.test import TestCase
+import time
+from unittest import mock
+from django.db.models import F
+from django.test import TestCase, override_settings
+from users.models import User
+from utils.base import login_jwt
 
-# Create your tests here.
+# Per-process cache, as a worker without CACHE_URL has
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(AUTH_STATELESS_JWT=True, CACHES=LOCAL_CACHES)
+class StatelessRevocationTests(TestCase):
+    """Tokens issued before a change to the user stop working"""
+
+    url = "/api/v1/store/favorites"
+
+    def setUp(self):
+        self.user = User.objects.create(username="buyer")
+        self.user.set_password("old password")
+        self.user.save()
+
+        # loaded as a view would, so save() sees what changed
+        self.user = User.objects.get(id=self.user.id)
+        self.token = login_jwt(self.user)
+
+    def get(self):
+        return self.client.get(
+            self.url, headers={"Authorization": f"Bearer {self.token}"}
+        )
+
+    def assertRevoked(self, response):
+        self.assertNotEqual(response.status_code, 200)
+        self.assertIn("Token has been revoked", response.json()["detail"])
+
+    def assertRevokedBy(self, change):
+        # the token state is cached by now
+        self.assertEqual(self.get().status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            change(self.user)
+            self.user.save()
+
+        self.assertRevoked(self.get())
+
+    def test_password_change(self):
+        self.assertRevokedBy(lambda user: user.set_password("new password"))
+
+    def test_deactivation(self):
+        self.assertRevokedBy(lambda user: setattr(user, "is_active", False))
+
+    def test_role_change(self):
+        self.assertRevokedBy(lambda user: setattr(user, "is_artist", True))
+
+    def test_unchanged_save_keeps_tokens(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Ann"
+            self.user.save()
+
+        self.assertEqual(self.get().status_code, 200)
+
+    @override_settings(AUTH_TOKEN_STATE_TTL=60)
+    def test_state_ttl_bounds_staleness(self):
+        self.assertEqual(self.get().status_code, 200)
+
+        # a change that skips User.save() leaves the cached state alone
+        User.objects.filter(id=self.user.id).update(
+            token_version=F("token_version") + 1
+        )
+
+        self.assertEqual(self.get().status_code, 200)
+
+        # until the cached state expires
+        later = time.time() + 61
+
+        with mock.patch("django.core.cache.backends.locmem.time.time") as now:
+            now.return_value = later
+
+            self.assertRevoked(self.get())
@@ -41,6 +41,13 @@ def update_password(request):
             if current_time - expiry_date <= 0:
                 user = User.objects.get(username=verified_credentials["username"])  # type: ignore
 
+                if user.token_version != verified_credentials.get("ver", 0):  # type: ignore
+                    messages.error(request, "Your password reset token has already been used.")
+
+                    return render(request, "auth/password_update.html", context)
+
+                # Changing the password bumps token_version, which revokes
+                # every login token as well as this reset link.
                 user.set_password(password)
                 user.save()
 
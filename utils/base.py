@@ -3,13 +3,15 @@ import uuid
 from typing import List
 from functools import wraps
 from datetime import datetime
-from users.models import User
+from django.core.cache import cache
+from users.models import User, ArtistProfile, TOKEN_STATE_CACHE_KEY
 from datetime import timedelta
 from django.conf import settings
 from django.utils import timezone
 from dateutil.parser import parse
 from ninja.errors import HttpError
 from ninja.security import HttpBearer
+from utils.tokens import verified_tokens
 
 TOKEN_EXPIRY = {
     "login": timedelta(days=3),
@@ -18,32 +20,76 @@ TOKEN_EXPIRY = {
 }
 
 
-def get_authenticated_user(request) -> User:
-    if not isinstance(request.auth, User):
+class TokenPrincipal:
+    """Caller identity answered from signed login claims (AUTH_STATELESS_JWT)"""
+
+    def __init__(self, payload: dict, is_active: bool):
+        self.id = uuid.UUID(payload["id"])
+        self.username = payload["username"]
+        self.is_artist = payload.get("is_artist", False)
+        self.is_staff = payload.get("is_staff", False)
+        # from get_token_state(), so also deactivations made with
+        # QuerySet.update() that never bumped token_version
+        self.is_active = is_active
+        self._user = None
+
+    @property
+    def user(self) -> User:
+        if self._user is None:
+            self._user = User.objects.select_related("artist_profile").get(
+                id=self.id
+            )
+
+        return self._user
+
+
+def get_principal(request) -> User | TokenPrincipal:
+    """Return the caller without touching the database"""
+
+    if not isinstance(request.auth, (User, TokenPrincipal)):
         raise HttpError(401, "Unauthorized: Invalid authentication")
 
-    try:
-        return User.objects.get(username=request.auth)
-    except User.DoesNotExist:
-        raise HttpError(404, "User not found")
+    return request.auth
 
 
-def check_if_is_staff(request):
+def get_authenticated_user(request) -> User:
+    """Return the principal resolved by AuthBearer for this request"""
+
+    principal = get_principal(request)
+
+    if isinstance(principal, TokenPrincipal):
+        try:
+            return principal.user
+        except User.DoesNotExist:
+            raise HttpError(404, "User not found")
+
+    return principal
+
+
+def get_artist_profile(request) -> ArtistProfile:
+    """Return the caller's artist profile, preloaded by AuthBearer"""
+
     user = get_authenticated_user(request)
 
+    return user.artist_profile  # raises ArtistProfile.DoesNotExist
+
+
+def check_if_is_staff(request):
+    user = get_principal(request)
+
     if not user.is_staff:
         raise HttpError(401, "Unauthorized")
 
 
 def check_if_is_active(request):
-    user = get_authenticated_user(request)
+    user = get_principal(request)
 
     if not user.is_active:
         raise HttpError(401, "Inactive account. Contact administrator.")
 
 
 def check_user_role(request, is_artist: bool):
-    user = get_authenticated_user(request)
+    user = get_principal(request)
 
     if user.is_artist == True and is_artist == False:
         raise HttpError(401, f"User is not a buyer.")
@@ -88,6 +134,8 @@ def login_jwt(user: User) -> str:
                 "id": str(user.id),
                 "username": user.username,
                 "is_artist": user.is_artist,
+                "is_staff": user.is_staff,
+                "ver": user.token_version,
                 "expires": expiry_date.timestamp(),
                 "iat": timezone.now().timestamp(),
             },
@@ -109,6 +157,8 @@ def password_reset_jwt(user: User) -> str:
                 "id": str(user.id),
                 "username": user.username,
                 "is_artist": user.is_artist,
+                "is_staff": user.is_staff,
+                "ver": user.token_version,
                 "expires": expiry_date.timestamp(),
                 "iat": timezone.now().timestamp(),
             },
@@ -134,6 +184,31 @@ def new_user_jwt(email) -> str:
         raise Exception(str(e))
 
 
+def get_token_state(user_id: str) -> tuple[int, bool] | None:
+    """A user's (token_version, is_active), cached for AUTH_TOKEN_STATE_TTL
+
+    Revocation deletes the entry, which reaches every worker at once with a
+    shared cache (CACHE_URL); the TTL bounds how long a worker with its own
+    cache, or a change that skipped User.save(), goes unnoticed.
+    """
+
+    key = TOKEN_STATE_CACHE_KEY.format(user_id)
+
+    state = cache.get(key)
+
+    if state is None:
+        state = (
+            User.objects.filter(id=user_id)
+            .values_list("token_version", "is_active")
+            .first()
+        )
+
+        if state is not None:
+            cache.set(key, state, timeout=settings.AUTH_TOKEN_STATE_TTL)
+
+    return state
+
+
 def decode_jwt(token: str) -> dict:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
@@ -150,14 +225,54 @@ def decode_jwt(token: str) -> dict:
         raise Exception(str(e))
 
 
+def decode_login_jwt(token: str) -> dict:
+    """decode_jwt with the verified payload memoised until the token expires"""
+
+    payload = verified_tokens.get(token)
+
+    if payload is None:
+        payload = decode_jwt(token)
+
+        verified_tokens.set(token, payload)
+
+    return payload
+
+
 class AuthBearer(HttpBearer):
     def authenticate(self, request, token):
         if token:
             try:
-                payload = decode_jwt(token)
+                payload = decode_login_jwt(token)
 
                 if payload and "username" in payload:
-                    return User.objects.get(username=payload["username"])
+                    if settings.AUTH_STATELESS_JWT and "id" in payload:
+                        state = get_token_state(payload["id"])
+
+                        if state is None:
+                            raise User.DoesNotExist()
+
+                        version, is_active = state
+
+                        if version != payload.get("ver", 0):
+                            verified_tokens.evict(token)
+
+                            raise Exception("Token has been revoked.")
+
+                        return TokenPrincipal(payload, is_active)
+
+                    # One query per request: the user and (for artists) the
+                    # artist profile are loaded together and reused by every
+                    # decorator and view through request.auth.
+                    user = User.objects.select_related("artist_profile").get(
+                        username=payload["username"]
+                    )
+
+                    if user.token_version != payload.get("ver", 0):
+                        verified_tokens.evict(token)
+
+                        raise Exception("Token has been revoked.")
+
+                    return user
             except User.DoesNotExist:
                 raise Exception("User associated with this token does not exist.")
             except Exception as e:
@@ -208,3 +323,19 @@ def parse_uuid(id: str) -> uuid.UUID:
         return uuid.UUID(id)
     except ValueError:
         raise HttpError(400, f"Invalid UUID: {id}")
+
+
+def parse_field_list(value: str | None, allowed, param: str) -> frozenset | None:
+    """A comma separated ?fields= / ?expand= value, checked against allowed"""
+
+    if value is None:
+        return None
+
+    names = frozenset(name.strip() for name in value.split(",") if name.strip())
+
+    unknown = names.difference(allowed)
+
+    if unknown:
+        raise HttpError(400, f"Unknown {param}: {', '.join(sorted(unknown))}")
+
+    return names
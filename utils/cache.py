@@ -0,0 +1,390 @@
+import json
+import math
+import time
+import random
+import hashlib
+from functools import wraps
+from pydantic import TypeAdapter
+from django.conf import settings
+from django.core import checks
+from django.db import transaction
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import HttpResponse
+from django.utils.http import http_date
+from django.utils.cache import get_conditional_response, patch_cache_control
+from utils.renderers import FastJSONRenderer
+
+VERSION_KEY = "respcache:version:{}"
+RESPONSE_KEY = "respcache:response:{}"
+LOCK_KEY = "respcache:lock:{}"
+STATS_KEY = "respcache:stats:{}:{}"
+
+# Endpoints wrapped by cached_response, for the stats command
+CACHED_ENDPOINTS: list[str] = []
+
+# Backends that keep entries in one process, where a version bumped by one
+# worker (or a celery task) is never seen by the others
+LOCAL_CACHE_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+renderer = FastJSONRenderer()
+
+
+def response_cache_enabled() -> bool:
+    """Responses are only cached in a cache every process shares"""
+
+    return settings.CACHES["default"]["BACKEND"] not in LOCAL_CACHE_BACKENDS
+
+
+@checks.register(checks.Tags.caches)
+def check_response_cache(app_configs, **kwargs):
+    if response_cache_enabled():
+        return []
+
+    return [
+        checks.Warning(
+            "The response cache is off: the default cache is not shared "
+            "between processes.",
+            hint="Set CACHE_URL to a shared cache such as Redis.",
+            id="utils.W001",
+        )
+    ]
+
+
+def get_versions(names: list[str]) -> dict:
+    """Current version of each name; unknown names start at a fresh value
+
+    Seeding with a timestamp rather than 0 means an evicted counter can never
+    come back at a value that old responses were cached under.
+    """
+
+    keys = {VERSION_KEY.format(name): name for name in names}
+
+    versions = cache.get_many(list(keys))
+
+    for key in keys.keys() - versions.keys():
+        cache.add(key, time.time_ns(), timeout=None)
+
+        versions[key] = cache.get(key)
+
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def bump_versions(*names: str) -> None:
+    """Invalidate every cached response that depends on any of the names
+
+    Versions are nanosecond timestamps of the last bump, so the newest of
+    a response's versions is also its Last-Modified. Each bump is a single
+    write, so concurrent bumps can't interleave.
+    """
+
+    now = time.time_ns()
+
+    cache.set_many({VERSION_KEY.format(name): now for name in names}, timeout=None)
+
+
+def bump_versions_on_commit(*names: str) -> None:
+    transaction.on_commit(lambda: bump_versions(*names))
+
+
+def record(endpoint: str, outcome: str) -> None:
+    if not settings.RESPONSE_CACHE_STATS:
+        return
+
+    key = STATS_KEY.format(endpoint, outcome)
+
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def get_stats() -> dict:
+    keys = [
+        STATS_KEY.format(endpoint, outcome)
+        for endpoint in CACHED_ENDPOINTS
+        for outcome in ("hit", "miss")
+    ]
+
+    counts = cache.get_many(keys)
+
+    stats = {}
+
+    for endpoint in CACHED_ENDPOINTS:
+        hits = counts.get(STATS_KEY.format(endpoint, "hit"), 0)
+        misses = counts.get(STATS_KEY.format(endpoint, "miss"), 0)
+
+        stats[endpoint] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else None,
+        }
+
+    return stats
+
+
+def _response_key(endpoint: str, kwargs: dict, query, versions: dict) -> str:
+    raw = json.dumps(
+        [
+            endpoint,
+            sorted((name, str(value)) for name, value in kwargs.items()),
+            sorted(query.lists()),
+            sorted(versions.items()),
+        ]
+    )
+
+    return RESPONSE_KEY.format(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def validators_enabled() -> bool:
+    """Signed media URLs expire while the versions stay the same, so a 304
+    would keep a client on URLs that no longer work (as cards_enabled)"""
+
+    return not getattr(default_storage, "querystring_auth", False)
+
+
+def _validators(request, endpoint: str, kwargs: dict, versions: dict):
+    """ETag and Last-Modified of a response built from the given versions
+
+    Nothing is rendered: the ETag hashes what the response key does, plus
+    the Authorization header for per-user responses. Both are None when
+    validators are off (see validators_enabled), which also means no 304.
+    """
+
+    if not validators_enabled():
+        return None, None
+
+    raw = json.dumps(
+        [
+            endpoint,
+            sorted((name, str(value)) for name, value in kwargs.items()),
+            sorted(request.GET.lists()),
+            sorted(versions.items()),
+            request.headers.get("Authorization", ""),
+        ]
+    )
+
+    etag = f'"{hashlib.sha1(raw.encode()).hexdigest()}"'
+
+    return etag, max(versions.values(), default=0) // 1_000_000_000
+
+
+def _set_validators(
+    request, response: HttpResponse, etag: str | None, last_modified: int | None
+):
+    if etag is None:
+        return response
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+
+    # Revalidate on every use, rather than reuse for a heuristic lifetime
+    if "Authorization" in request.headers:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+
+    return response
+
+
+def conditional_response(*dependencies):
+    """ETag / Last-Modified and 304s for a GET endpoint, from version names
+
+    dependencies are as for cached_response(), which does this too. A
+    matching If-None-Match (or, without one, If-Modified-Since) is answered
+    with a 304 before the view runs. Only 200 HttpResponses get validators,
+    only with a shared cache, where every process sees each bump, and only
+    without signed media URLs (see validators_enabled).
+    """
+
+    def decorator(func):
+        endpoint = f"{func.__module__}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            if not response_cache_enabled():
+                return func(request, *args, **kwargs)
+
+            names = [
+                dependency(**kwargs) if callable(dependency) else dependency
+                for dependency in dependencies
+            ]
+
+            etag, last_modified = _validators(
+                request, endpoint, kwargs, get_versions(names)
+            )
+
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+
+            if not_modified is not None:
+                return _set_validators(request, not_modified, etag, last_modified)
+
+            result = func(request, *args, **kwargs)
+
+            if isinstance(result, HttpResponse) and result.status_code == 200:
+                _set_validators(request, result, etag, last_modified)
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _should_recompute(entry: dict) -> bool:
+    """Probabilistic early expiration (XFetch)
+
+    Each reader volunteers to recompute with a probability that rises as the
+    entry nears expiry, scaled by how long the last computation took, so a
+    hot key is usually refreshed by one request before it actually expires.
+    """
+
+    beta = settings.RESPONSE_CACHE_EARLY_RECOMPUTE_BETA
+
+    return (
+        time.time() - entry["delta"] * beta * math.log(random.random() or 1e-12)
+        >= entry["expiry"]
+    )
+
+
+def _to_response(
+    entry: dict, request, etag: str | None, last_modified: int | None
+) -> HttpResponse:
+    response = HttpResponse(
+        entry["content"],
+        status=entry["status"],
+        content_type=entry["content_type"],
+    )
+
+    return _set_validators(request, response, etag, last_modified)
+
+
+def cached_response(*dependencies, response=None, timeout: int | None = None):
+    """Cache a public GET endpoint's rendered JSON
+
+    dependencies are version names the response is built from, e.g.
+    "category", or callables taking the view kwargs and returning one, e.g.
+    lambda product_id: f"product:{product_id}". bump_versions() on any of
+    them invalidates the entry. response is the schema used to render
+    results that are not already an HttpResponse; it must match the
+    router's response= so cached and uncached bytes are identical.
+
+    Responses carry an ETag and Last-Modified derived from the versions,
+    and a matching conditional request gets a 304 without a cache read,
+    unless media URLs are signed (see validators_enabled).
+    Without a shared cache (see response_cache_enabled) the view just runs.
+    """
+
+    adapter = TypeAdapter(response) if response is not None else None
+
+    def decorator(func):
+        endpoint = f"{func.__module__}.{func.__name__}"
+
+        CACHED_ENDPOINTS.append(endpoint)
+
+        def compute(request, args, kwargs) -> dict:
+            started = time.perf_counter()
+
+            result = func(request, *args, **kwargs)
+
+            if not isinstance(result, HttpResponse):
+                data = adapter.dump_python(
+                    adapter.validate_python(result, from_attributes=True)
+                )
+
+                result = HttpResponse(
+                    renderer.render(request, data, response_status=200),
+                    content_type=f"{renderer.media_type}; charset={renderer.charset}",
+                )
+
+            if result.status_code != 200:
+                return {"response": result}
+
+            ttl = timeout or settings.RESPONSE_CACHE_TIMEOUT
+
+            return {
+                "content": result.content,
+                "status": result.status_code,
+                "content_type": result["Content-Type"],
+                "delta": time.perf_counter() - started,
+                "expiry": time.time() + ttl,
+                "ttl": ttl,
+            }
+
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            if not response_cache_enabled():
+                return func(request, *args, **kwargs)
+
+            names = [
+                dependency(**kwargs) if callable(dependency) else dependency
+                for dependency in dependencies
+            ]
+
+            versions = get_versions(names)
+
+            etag, last_modified = _validators(request, endpoint, kwargs, versions)
+
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+
+            if not_modified is not None:
+                return _set_validators(request, not_modified, etag, last_modified)
+
+            key = _response_key(endpoint, kwargs, request.GET, versions)
+            lock = LOCK_KEY.format(key)
+
+            entry = cache.get(key)
+
+            if entry is not None and not _should_recompute(entry):
+                record(endpoint, "hit")
+
+                return _to_response(entry, request, etag, last_modified)
+
+            # Single flight: one request recomputes, the others serve the
+            # current entry or briefly wait for the recomputed one.
+            locked = cache.add(lock, 1, timeout=settings.RESPONSE_CACHE_LOCK_TIMEOUT)
+
+            if not locked:
+                if entry is not None:
+                    record(endpoint, "hit")
+
+                    return _to_response(entry, request, etag, last_modified)
+
+                deadline = time.time() + settings.RESPONSE_CACHE_LOCK_TIMEOUT
+
+                while time.time() < deadline:
+                    time.sleep(0.05)
+
+                    entry = cache.get(key)
+
+                    if entry is not None:
+                        record(endpoint, "hit")
+
+                        return _to_response(entry, request, etag, last_modified)
+
+            record(endpoint, "miss")
+
+            try:
+                entry = compute(request, args, kwargs)
+
+                if "response" in entry:
+                    return entry["response"]
+
+                cache.set(key, entry, timeout=entry["ttl"])
+            finally:
+                if locked:
+                    cache.delete(lock)
+
+            return _to_response(entry, request, etag, last_modified)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,255 @@
+import io
+import os
+import uuid
+import hashlib
+from celery import chain, shared_task
+from PIL import Image, ImageOps
+from django.apps import apps
+from django.db import transaction
+from ninja.errors import HttpError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from products.models import ImageBlob
+from products.blobs import claim, release
+
+# Raw uploads wait here until process_image replaces them
+STAGING_PREFIX = "uploads/tmp/"
+
+MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+
+Image.init()
+
+# AVIF needs a Pillow build (or plugin) with an AVIF encoder
+IMAGE_FORMATS = ("avif", "webp") if "AVIF" in Image.SAVE else ("webp",)
+
+IMAGE_QUALITY = 80
+
+# (model, field) -> variant name: longest edge in px. variants_field, when
+# set, receives the variant map; the image field itself always ends up
+# pointing at the "full" WebP.
+IMAGE_VARIANTS = {
+    ("products.product", "image"): {
+        "sizes": {"thumbnail": 160, "card": 480, "full": 1600},
+        "variants_field": "image_variants",
+    },
+    ("users.user", "profile_picture"): {
+        "sizes": {"full": 512},
+    },
+    ("users.artistprofile", "banner_image"): {
+        "sizes": {"full": 2048},
+    },
+}
+
+
+def staging_key(file_name: str) -> str:
+    extension = os.path.splitext(file_name or "")[1].lower()
+
+    return f"{STAGING_PREFIX}{uuid.uuid4().hex}{extension}"
+
+
+def content_digest(file) -> str:
+    digest = hashlib.sha256()
+
+    for chunk in file.chunks():
+        digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def blob_key(model, field_name: str, digest: str) -> str:
+    """Where the variants of an image with this digest live, see ImageBlob"""
+
+    return f"{model._meta.get_field(field_name).upload_to}{digest}/"
+
+
+def check_upload(file) -> None:
+    """A cheap sanity check before anything is stored"""
+
+    if file.size > MAX_UPLOAD_SIZE:
+        raise HttpError(400, "Image is too large")
+
+    try:
+        Image.open(file).verify()
+    except Exception:
+        raise HttpError(400, "Not a valid image")
+
+    file.seek(0)
+
+
+def stage_upload(file) -> str:
+    """Store a raw upload under a temporary key"""
+
+    check_upload(file)
+
+    return default_storage.save(staging_key(file.name), file)
+
+
+def process_upload(instance, field_name: str, file, then=None) -> str | None:
+    """Stage the upload and process it on the worker once the request commits
+
+    An image that is already stored (same bytes, same field) is attached
+    right away instead, without writing anything to storage. then is an
+    optional task signature run after either, e.g. the Stripe sync that
+    needs the final image URL.
+
+    Returns the staged key, or None if the upload was a duplicate.
+    """
+
+    check_upload(file)
+
+    blob = claim(blob_key(instance, field_name, content_digest(file)))
+
+    if blob is not None:
+        attach(instance, field_name, blob)
+
+        if then is not None:
+            transaction.on_commit(then.delay)
+
+        return None
+
+    file.seek(0)
+
+    staged_key = default_storage.save(staging_key(file.name), file)
+
+    process_staged(instance, field_name, staged_key, then)
+
+    return staged_key
+
+
+def process_staged(instance, field_name: str, staged_key: str, then=None) -> None:
+    """Process an already staged image, e.g. a confirmed direct upload"""
+
+    task = process_image.si(
+        instance._meta.label_lower, str(instance.pk), field_name, staged_key
+    )
+
+    if then is not None:
+        task = chain(task, then)
+
+    transaction.on_commit(task.delay)
+
+
+def _encode(image: Image.Image, format: str, icc_profile) -> bytes:
+    buffer = io.BytesIO()
+
+    # Nothing from the original info (EXIF, XMP, comments) is written back
+    # except the colour profile.
+    image.save(
+        buffer,
+        format=format.upper(),
+        quality=IMAGE_QUALITY,
+        icc_profile=icc_profile,
+    )
+
+    return buffer.getvalue()
+
+
+def render_variants(image: Image.Image, sizes: dict, formats, prefix: str) -> dict:
+    """Save each size in each format; returns the variant map of storage keys"""
+
+    icc_profile = image.info.get("icc_profile")
+
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    variants = {}
+
+    for name, size in sizes.items():
+        variant = image.copy()
+        variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+        variants[name] = {"width": variant.width, "height": variant.height}
+
+        for format in formats:
+            variants[name][format] = default_storage.save(
+                f"{prefix}{name}.{format}",
+                ContentFile(_encode(variant, format, icc_profile)),
+            )
+
+    return variants
+
+
+@shared_task
+def process_image(model_label: str, pk: str, field_name: str, staged_key: str):
+    """Replace a staged upload with stripped, resized WebP (and AVIF) variants
+
+    Variants are stored once per distinct source image, under its hash.
+    """
+
+    model = apps.get_model(model_label)
+    spec = IMAGE_VARIANTS[(model_label, field_name)]
+
+    try:
+        instance = model.objects.get(pk=pk)
+    except model.DoesNotExist:
+        default_storage.delete(staged_key)
+        return
+
+    with default_storage.open(staged_key, "rb") as file:
+        key = blob_key(model, field_name, content_digest(file))
+
+        # a re-upload only needs the existing blob
+        blob = claim(key)
+
+        if blob is None:
+            file.seek(0)
+
+            image = Image.open(file)
+            image.load()
+
+    if blob is None:
+        variants = render_variants(
+            image,
+            spec["sizes"],
+            IMAGE_FORMATS if spec.get("variants_field") else ("webp",),
+            key,
+        )
+
+        blob, created = ImageBlob.objects.get_or_create(
+            key=key, defaults={"variants": variants, "ref_count": 1}
+        )
+
+        if not created:
+            # processed concurrently, into the same keys
+            claim(key)
+
+    attach(instance, field_name, blob)
+
+    default_storage.delete(staged_key)
+
+
+def attach(instance, field_name: str, blob: ImageBlob) -> None:
+    """Point the image field at a blob the caller holds a reference to
+
+    The reference held through the field's previous image is dropped.
+    """
+
+    spec = IMAGE_VARIANTS[(instance._meta.label_lower, field_name)]
+    previous = getattr(instance, field_name).name
+
+    setattr(instance, field_name, blob.variants["full"]["webp"])
+    update_fields = [field_name]
+
+    if spec.get("variants_field"):
+        setattr(instance, spec["variants_field"], blob.variants)
+        update_fields.append(spec["variants_field"])
+
+    with transaction.atomic():
+        instance.save(update_fields=update_fields)
+
+        release(previous)
+
+
+def variant_urls(variants: dict) -> dict:
+    """The stored variant map with storage keys turned into URLs"""
+
+    return {
+        name: {
+            key: default_storage.url(value) if key in ("avif", "webp") else value
+            for key, value in variant.items()
+        }
+        for name, variant in (variants or {}).items()
+    }
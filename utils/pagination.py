@@ -0,0 +1,143 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.core.exceptions import ValidationError
+from ninja.errors import HttpError
+
+
+def _encode_value(value):
+    # Full precision isoformat: the cursor must compare equal to the column
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    return str(value)
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps(values, default=_encode_value, separators=(",", ":"))
+
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HttpError(400, "Invalid cursor")
+
+    if not isinstance(values, list):
+        raise HttpError(400, "Invalid cursor")
+
+    return values
+
+
+def get_page_size(page_size: int | None) -> int:
+    if not page_size or page_size < 1:
+        return settings.KEYSET_PAGE_SIZE
+
+    return min(page_size, settings.KEYSET_MAX_PAGE_SIZE)
+
+
+def _get_ordering(queryset: QuerySet) -> list[tuple[str, bool]]:
+    if not queryset.query.order_by:
+        raise ValueError("Keyset pagination requires an ordered queryset")
+
+    return [
+        (field.lstrip("-"), field.startswith("-"))
+        for field in queryset.query.order_by
+    ]
+
+
+def _ordering_field(queryset: QuerySet, name: str):
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+
+    if name == "pk":
+        return queryset.model._meta.pk
+
+    return queryset.model._meta.get_field(name)
+
+
+def _cursor_values(queryset: QuerySet, ordering, values: list) -> list:
+    """The cursor's values as their ordering columns' Python types
+
+    A cursor is client input: anything that doesn't convert is a 400
+    rather than an error from the query.
+    """
+
+    if len(values) != len(ordering):
+        raise HttpError(400, "Invalid cursor")
+
+    try:
+        converted = [
+            _ordering_field(queryset, field).to_python(value)
+            for (field, _), value in zip(ordering, values)
+        ]
+    except (ValidationError, TypeError, ValueError):
+        raise HttpError(400, "Invalid cursor")
+
+    if any(value is None for value in converted):
+        raise HttpError(400, "Invalid cursor")
+
+    return converted
+
+
+def _after(ordering: list[tuple[str, bool]], values: list) -> Q:
+    """Rows strictly after the cursor row in the queryset's ordering"""
+
+    condition = Q()
+
+    for index, (field, descending) in enumerate(ordering):
+        lookup = "lt" if descending else "gt"
+
+        step = Q(**{f"{field}__{lookup}": values[index]})
+
+        for position, (previous_field, _) in enumerate(ordering[:index]):
+            step &= Q(**{previous_field: values[position]})
+
+        condition |= step
+
+    return condition
+
+
+def _row_value(row, field: str):
+    if isinstance(row, dict):
+        return row[field]
+
+    return getattr(row, field)
+
+
+def paginate_keyset(
+    queryset: QuerySet,
+    cursor: str | None = None,
+    page_size: int | None = None,
+) -> tuple[list, str | None]:
+    """Return one page of an ordered queryset and the cursor of the next page
+
+    The queryset's order_by() is the keyset, so it must end in a unique
+    column (e.g. ("-created_at", "-id")). Rows may be model instances or
+    .values() dicts as long as they carry every ordering column.
+    """
+
+    ordering = _get_ordering(queryset)
+
+    if cursor:
+        values = _cursor_values(queryset, ordering, decode_cursor(cursor))
+
+        queryset = queryset.filter(_after(ordering, values))
+
+    size = get_page_size(page_size)
+
+    rows = list(queryset[: size + 1])
+
+    if len(rows) <= size:
+        return rows, None
+
+    rows = rows[:size]
+
+    return rows, encode_cursor([_row_value(rows[-1], field) for field, _ in ordering])
@@ -0,0 +1,50 @@
+import json
+from ninja.parser import Parser
+from ninja.renderers import JSONRenderer
+from ninja.responses import NinjaJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # falls back to the stdlib encoder ninja uses
+    orjson = None
+
+encoder = NinjaJSONEncoder()
+
+# orjson writes UUIDs like str() does. Everything it would write
+# differently goes through NinjaJSONEncoder.default() instead, as with
+# the stdlib renderer: Decimal (a string, "12.50"), datetimes (millisecond
+# precision, "Z" for UTC) and pydantic models. Output is compact and not
+# ASCII-escaped; values are unchanged.
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+)
+
+
+def dumps(data) -> bytes:
+    """JSON for API responses and anything rendered ahead of them"""
+
+    if orjson is None:
+        return json.dumps(data, cls=NinjaJSONEncoder).encode()
+
+    return orjson.dumps(data, default=encoder.default, option=ORJSON_OPTIONS)
+
+
+def loads(data: bytes | str):
+    if orjson is None:
+        return json.loads(data)
+
+    return orjson.loads(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer using orjson when it is installed"""
+
+    def render(self, request, data, *, response_status):
+        return dumps(data)
+
+
+class FastJSONParser(Parser):
+    """Parser using orjson when it is installed"""
+
+    def parse_body(self, request):
+        return loads(request.body)
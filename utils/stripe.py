@@ -10,6 +10,25 @@ from users.models import ArtistProfile
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
+def _create_stripe_product(product: Product) -> None:
+    stripe_product = stripe.Product.create(
+        name=product.name,
+        description=product.description,
+        images=[product.image.url] if product.image else [],
+    )
+
+    stripe_price = stripe.Price.create(
+        currency="usd",
+        unit_amount=int(product.price) * 100,
+        product=stripe_product.id,
+    )
+
+    product.stripe_product_id = stripe_product.id
+    product.stripe_price_id = stripe_price.id
+
+    product.save(update_fields=["stripe_product_id", "stripe_price_id"])
+
+
 @shared_task
 def _create_product(product_id: str) -> None:
     """Create a new product on Stripe"""
@@ -19,28 +38,58 @@ def _create_product(product_id: str) -> None:
     try:
         product = Product.objects.get(id=product_id)
 
-        stripe_product = stripe.Product.create(
-            name=product.name,
-            description=product.description,
-            images=[product.image.url],
-        )
+        _create_stripe_product(product)
+    except Exception as e:
+        raise Exception(f"Error creating product on Stripe: {e}")
 
+
+@shared_task
+def _create_products(product_ids: list[str]) -> None:
+    """Create many new products on Stripe in one job
+
+    A failure is reported after the rest of the batch has been created.
+    """
+
+    products = Product.objects.filter(
+        id__in=[parse_uuid(product_id) for product_id in product_ids],
+        stripe_product_id__isnull=True,
+    )
+
+    errors = []
+
+    for product in products.iterator():
+        try:
+            _create_stripe_product(product)
+        except Exception as e:
+            errors.append(f"{product.id}: {e}")
+
+    if errors:
+        raise Exception(f"Error creating products on Stripe: {'; '.join(errors)}")
+
+
+def _update_stripe_product(product: Product, reprice: bool = True) -> None:
+    stripe_product = stripe.Product.modify(
+        str(product.stripe_product_id),
+        name=product.name,
+        description=product.description,
+        images=[product.image.url] if product.image else [],
+    )
+
+    # Stripe prices are immutable, so a price change needs a new one
+    if reprice:
         stripe_price = stripe.Price.create(
             currency="usd",
             unit_amount=int(product.price) * 100,
             product=stripe_product.id,
         )
 
-        product.stripe_product_id = stripe_product.id
         product.stripe_price_id = stripe_price.id
 
-        product.save()
-    except Exception as e:
-        raise Exception(f"Error creating product on Stripe: {e}")
+        product.save(update_fields=["stripe_price_id"])
 
 
 @shared_task
-def _update_product(product_id: str) -> None:
+def _update_product(product_id: str, reprice: bool = True) -> None:
     """Update a product on stripe"""
 
     product_id = parse_uuid(product_id)  # type: ignore
@@ -48,24 +97,36 @@ def _update_product(product_id: str) -> None:
     try:
         product = Product.objects.get(id=product_id)
 
-        stripe_product = stripe.Product.modify(
-            str(product.stripe_product_id),
-            name=product.name,
-            description=product.description,
-            images=[product.image.url],
-        )
+        _update_stripe_product(product, reprice)
+    except Exception as e:
+        raise Exception(f"Error updating product on Stripe: {e}")
 
-        stripe_price = stripe.Price.create(
-            currency="usd",
-            unit_amount=int(product.price) * 100,
-            product=stripe_product.id,
-        )
 
-        product.stripe_price_id = stripe_price.id
+@shared_task
+def _update_products(product_ids: list[str], reprice_ids: list[str]) -> None:
+    """Update many products on Stripe in one job
 
-        product.save()
-    except Exception as e:
-        raise Exception(f"Error updating product on Stripe: {e}")
+    Only products in reprice_ids get a new price. Products that are not
+    on Stripe yet are skipped; their pending creation sends current data.
+    """
+
+    repriced = set(reprice_ids)
+
+    products = Product.objects.filter(
+        id__in=[parse_uuid(product_id) for product_id in product_ids],
+        stripe_product_id__isnull=False,
+    )
+
+    errors = []
+
+    for product in products.iterator():
+        try:
+            _update_stripe_product(product, str(product.id) in repriced)
+        except Exception as e:
+            errors.append(f"{product.id}: {e}")
+
+    if errors:
+        raise Exception(f"Error updating products on Stripe: {'; '.join(errors)}")
 
 
 def create_payment_link(order_id: str) -> dict:
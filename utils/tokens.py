@@ -0,0 +1,89 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.utils import timezone
+
+
+class VerifiedTokenCache:
+    """Per-process LRU of decoded login tokens, keyed by token digest"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> dict | None:
+        key = self.digest(token)
+
+        with self._lock:
+            payload = self._entries.get(key)
+
+            if payload is not None and timezone.now().timestamp() > payload["expires"]:
+                del self._entries[key]
+
+                payload = None
+
+            if payload is None:
+                self.misses += 1
+
+                return None
+
+            self._entries.move_to_end(key)
+
+            self.hits += 1
+
+            return payload
+
+    def set(self, token: str, payload: dict) -> None:
+        # Only tokens with an expiry are cached, so entries never outlive them
+        if "expires" not in payload:
+            return
+
+        key = self.digest(token)
+
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(self.digest(token), None)
+
+    def evict_user(self, user_id) -> None:
+        user_id = str(user_id)
+
+        with self._lock:
+            for key in [
+                key
+                for key, payload in self._entries.items()
+                if payload.get("id") == user_id
+            ]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+verified_tokens = VerifiedTokenCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE)
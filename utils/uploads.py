@@ -0,0 +1,140 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from django.db import IntegrityError, transaction
+from ninja.errors import HttpError
+from botocore.exceptions import ClientError
+from django.core.files.storage import default_storage
+from utils.images import MAX_UPLOAD_SIZE, staging_key
+from products.models import ConfirmedUpload
+
+UPLOAD_SALT = "utils.uploads"
+
+# Accepted content types and the extension of their staged key
+UPLOAD_CONTENT_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+}
+
+# What the first bytes of each content type look like
+SIGNATURES = {
+    "image/jpeg": lambda head: head.startswith(b"\xff\xd8\xff"),
+    "image/png": lambda head: head.startswith(b"\x89PNG\r\n\x1a\n"),
+    "image/webp": lambda head: head[:4] == b"RIFF" and head[8:12] == b"WEBP",
+}
+
+
+def _client():
+    connection = getattr(default_storage, "connection", None)
+
+    if connection is None:
+        raise HttpError(400, "Direct uploads need S3 storage")
+
+    return connection.meta.client
+
+
+def _object_key(key: str) -> str:
+    # the bucket key, including the storage's location prefix if any
+    return default_storage._normalize_name(key)
+
+
+def create_presigned_upload(user_id, target: str, content_type: str) -> dict:
+    """A presigned POST that lets the client send the image straight to S3
+
+    The returned token names the staged key; confirm_upload() only accepts
+    it back from the same user for the same target.
+    """
+
+    if content_type not in UPLOAD_CONTENT_TYPES:
+        allowed = ", ".join(UPLOAD_CONTENT_TYPES)
+
+        raise HttpError(400, f"Unsupported content type, expected one of {allowed}")
+
+    key = staging_key(f"upload{UPLOAD_CONTENT_TYPES[content_type]}")
+
+    post = _client().generate_presigned_post(
+        Bucket=default_storage.bucket_name,
+        Key=_object_key(key),
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, MAX_UPLOAD_SIZE],
+        ],
+        ExpiresIn=settings.UPLOAD_URL_EXPIRY,
+    )
+
+    token = signing.dumps(
+        {"key": key, "user": str(user_id), "target": target, "type": content_type},
+        salt=UPLOAD_SALT,
+    )
+
+    return {
+        "url": post["url"],
+        "fields": post["fields"],
+        "token": token,
+        "expires_in": settings.UPLOAD_URL_EXPIRY,
+    }
+
+
+def confirm_upload(token: str, user_id, target: str) -> str:
+    """Check a finished direct upload and return its staged key
+
+    S3 enforces the size and declared content type through the POST
+    policy; this re-checks them and sniffs the first bytes, so a renamed
+    non-image never reaches the image pipeline.
+    """
+
+    try:
+        upload = signing.loads(
+            token,
+            salt=UPLOAD_SALT,
+            max_age=settings.UPLOAD_URL_EXPIRY * 2,
+        )
+    except signing.BadSignature:
+        raise HttpError(400, "Invalid or expired upload token")
+
+    if upload["user"] != str(user_id) or upload["target"] != target:
+        raise HttpError(400, "Invalid or expired upload token")
+
+    client = _client()
+    bucket = default_storage.bucket_name
+    object_key = _object_key(upload["key"])
+
+    try:
+        head = client.head_object(Bucket=bucket, Key=object_key)
+    except ClientError:
+        raise HttpError(400, "Upload not found")
+
+    try:
+        first_bytes = client.get_object(
+            Bucket=bucket, Key=object_key, Range="bytes=0-11"
+        )["Body"].read()
+    except ClientError:
+        raise HttpError(400, "Upload not found")
+
+    if (
+        head["ContentLength"] > MAX_UPLOAD_SIZE
+        or head.get("ContentType") != upload["type"]
+        or not SIGNATURES[upload["type"]](first_bytes)
+    ):
+        default_storage.delete(upload["key"])
+
+        raise HttpError(400, "Upload is not a valid image")
+
+    # a token is good for one confirmation; its row can go once the token
+    # has expired
+    token_max_age = timedelta(seconds=settings.UPLOAD_URL_EXPIRY * 2)
+
+    ConfirmedUpload.objects.filter(
+        confirmed_at__lt=timezone.now() - token_max_age
+    ).delete()
+
+    try:
+        with transaction.atomic():
+            ConfirmedUpload.objects.create(key=upload["key"])
+    except IntegrityError:
+        raise HttpError(400, "Upload has already been confirmed")
+
+    return upload["key"]